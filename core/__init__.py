@@ -8,7 +8,7 @@ from .skill_watcher import SkillWatcher, PendingSkill
 from .ai_engine import AIEngine, AIContext
 from .memory import MemoryManager, Memory
 from .router import MessageRouter, RouteType, RoutedMessage, CommandPrefix
-from .thread_manager import ThreadManager, TaskInfo
+from .thread_manager import ThreadManager, TaskInfo, TaskStatus
 from .message_queue import MessageQueue, QueueManager, MessagePriority, QueueMessage
 from .daemon import CoreDaemon, DaemonStatus, ModuleInfo
 from .dependency_monitor import DependencyMonitor, PackageInfo, UpgradeRequest
@@ -25,7 +25,7 @@ __all__ = [
     'AIEngine', 'AIContext',
     'MemoryManager', 'Memory',
     'MessageRouter', 'RouteType', 'RoutedMessage', 'CommandPrefix',
-    'ThreadManager', 'TaskInfo',
+    'ThreadManager', 'TaskInfo', 'TaskStatus',
     'MessageQueue', 'QueueManager', 'MessagePriority', 'QueueMessage',
     'CoreDaemon', 'DaemonStatus', 'ModuleInfo',
     'DependencyMonitor', 'PackageInfo', 'UpgradeRequest',
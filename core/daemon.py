@@ -4,7 +4,6 @@ SDFAI Core Daemon - 核心守护进程
 """
 import asyncio
 import json
-import subprocess
 import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Callable, Any
@@ -13,6 +12,24 @@ from datetime import datetime
 from enum import Enum
 
 
+async def _run_command(args: List[str], cwd: Optional[str] = None,
+                       timeout: float = 30) -> tuple:
+    """异步执行外部命令，返回 (returncode, stdout)；超时则终止子进程并抛出 TimeoutError"""
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    return proc.returncode, stdout.decode('utf-8', errors='replace')
+
+
 class DaemonStatus(Enum):
     STARTING = "starting"
     RUNNING = "running"
@@ -187,15 +204,13 @@ class CoreDaemon:
     
     async def _get_pip_latest_version(self, package: str) -> Optional[str]:
         try:
-            result = subprocess.run(
+            _, stdout = await _run_command(
                 [sys.executable, "-m", "pip", "index", "versions", package],
-                capture_output=True,
-                text=True,
                 timeout=30
             )
             
             import re
-            match = re.search(r'Available versions:\s*([\d.,\s]+)', result.stdout)
+            match = re.search(r'Available versions:\s*([\d.,\s]+)', stdout)
             if match:
                 versions = match.group(1).split(',')
                 return versions[0].strip()
@@ -206,15 +221,13 @@ class CoreDaemon:
     
     async def _get_git_latest_version(self, repo_path: str) -> Optional[str]:
         try:
-            result = subprocess.run(
+            _, stdout = await _run_command(
                 ["git", "fetch", "--dry-run"],
                 cwd=repo_path,
-                capture_output=True,
-                text=True,
                 timeout=30
             )
             
-            if result.stdout:
+            if stdout:
                 return "update_available"
         except:
             pass
@@ -282,21 +295,19 @@ class CoreDaemon:
     async def _execute_upgrade(self, module: ModuleInfo) -> bool:
         try:
             if module.source == "pip":
-                result = subprocess.run(
+                returncode, _ = await _run_command(
                     [sys.executable, "-m", "pip", "install", "--upgrade", module.name],
-                    capture_output=True,
                     timeout=300
                 )
-                return result.returncode == 0
+                return returncode == 0
             
             elif module.source == "git":
-                result = subprocess.run(
+                returncode, _ = await _run_command(
                     ["git", "pull"],
                     cwd=module.file_path,
-                    capture_output=True,
                     timeout=60
                 )
-                return result.returncode == 0
+                return returncode == 0
             
             return False
         except:
@@ -5,8 +5,9 @@ Message Queue - 消息队列管理
 import asyncio
 import json
 import heapq
+import operator
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
@@ -29,7 +30,14 @@ class MessageStatus(Enum):
     RETRY = "retry"
 
 
-@dataclass(order=True)
+_QUEUE_MESSAGE_FIELDS = (
+    "message_id", "priority", "content", "source", "target",
+    "created_at", "status", "retry_count", "max_retries", "metadata"
+)
+_get_queue_message_fields = operator.attrgetter(*_QUEUE_MESSAGE_FIELDS)
+
+
+@dataclass(order=True, slots=True)
 class QueueMessage:
     priority: int
     message_id: str = field(compare=False)
@@ -43,17 +51,19 @@ class QueueMessage:
     metadata: Dict = field(compare=False, default_factory=dict)
     
     def to_dict(self) -> dict:
+        (message_id, priority, content, source, target,
+         created_at, status, retry_count, max_retries, metadata) = _get_queue_message_fields(self)
         return {
-            "message_id": self.message_id,
-            "priority": self.priority,
-            "content": self.content,
-            "source": self.source,
-            "target": self.target,
-            "created_at": self.created_at.isoformat(),
-            "status": self.status.value,
-            "retry_count": self.retry_count,
-            "max_retries": self.max_retries,
-            "metadata": self.metadata
+            "message_id": message_id,
+            "priority": priority,
+            "content": content,
+            "source": source,
+            "target": target,
+            "created_at": created_at.isoformat(),
+            "status": status.value,
+            "retry_count": retry_count,
+            "max_retries": max_retries,
+            "metadata": metadata
         }
     
     @classmethod
@@ -73,18 +83,26 @@ class QueueMessage:
 
 
 class MessageQueue:
+    FLUSH_DELAY = 0.005
+    FLUSH_BATCH_SIZE = 256
+    
     def __init__(self, data_dir: Path, queue_name: str = "default"):
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.queue_name = queue_name
+        self._queue_file = self.data_dir / f"queue_{self.queue_name}.json"
         
         self._queue: List[QueueMessage] = []
         self._processing: Dict[str, QueueMessage] = {}
-        self._handlers: Dict[str, Callable] = {}
+        self._handlers: Dict[str, Tuple[Callable, bool]] = {}
         self._lock = asyncio.Lock()
         self._not_empty = asyncio.Event()
         self._running = False
         self._processor_task: Optional[asyncio.Task] = None
+        
+        self._records: Optional[Dict[str, dict]] = None
+        self._pending_writes = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
     
     def generate_message_id(self) -> str:
         return f"msg_{uuid.uuid4().hex[:12]}"
@@ -164,7 +182,7 @@ class MessageQueue:
         await self._update_message_status(message)
     
     def register_handler(self, message_type: str, handler: Callable):
-        self._handlers[message_type] = handler
+        self._handlers[message_type] = (handler, asyncio.iscoroutinefunction(handler))
     
     async def start_processing(self):
         if self._running:
@@ -181,6 +199,7 @@ class MessageQueue:
                 await self._processor_task
             except asyncio.CancelledError:
                 pass
+        self.flush()
     
     async def _process_loop(self):
         while self._running:
@@ -190,10 +209,11 @@ class MessageQueue:
                 continue
             
             try:
-                handler = self._handlers.get(message.target)
+                entry = self._handlers.get(message.target)
                 
-                if handler:
-                    if asyncio.iscoroutinefunction(handler):
+                if entry:
+                    handler, is_coro = entry
+                    if is_coro:
                         result = await handler(message)
                     else:
                         result = handler(message)
@@ -205,43 +225,56 @@ class MessageQueue:
             except Exception as e:
                 await self.ack(message.message_id, success=False, error=str(e))
     
-    async def _persist_message(self, message: QueueMessage):
-        queue_file = self.data_dir / f"queue_{self.queue_name}.json"
+    def _load_records(self) -> Dict[str, dict]:
+        if self._records is None:
+            self._records = {}
+            if self._queue_file.exists():
+                try:
+                    for msg_data in json.loads(self._queue_file.read_text(encoding='utf-8')):
+                        self._records[msg_data["message_id"]] = msg_data
+                except (OSError, ValueError, KeyError, TypeError):
+                    pass
+        return self._records
+    
+    def _schedule_flush(self):
+        """合并短时间内的多次写入，批量落盘"""
+        self._pending_writes += 1
         
-        messages = []
-        if queue_file.exists():
-            try:
-                messages = json.loads(queue_file.read_text(encoding='utf-8'))
-            except:
-                pass
+        if self._pending_writes >= self.FLUSH_BATCH_SIZE:
+            self.flush()
+            return
+        
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.FLUSH_DELAY, self.flush)
+    
+    def flush(self):
+        """立即将待写入的消息状态写入队列文件"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
         
-        messages.append(message.to_dict())
+        if not self._pending_writes or self._records is None:
+            return
         
-        queue_file.write_text(
-            json.dumps(messages, ensure_ascii=False, indent=2),
+        self._pending_writes = 0
+        self._queue_file.write_text(
+            json.dumps(list(self._records.values()), ensure_ascii=False, indent=2),
             encoding='utf-8'
         )
     
+    async def _persist_message(self, message: QueueMessage):
+        self._load_records()[message.message_id] = message.to_dict()
+        self._schedule_flush()
+    
     async def _update_message_status(self, message: QueueMessage):
-        queue_file = self.data_dir / f"queue_{self.queue_name}.json"
+        records = self._load_records()
         
-        if not queue_file.exists():
+        if message.message_id not in records:
             return
         
-        try:
-            messages = json.loads(queue_file.read_text(encoding='utf-8'))
-            
-            for i, msg_data in enumerate(messages):
-                if msg_data["message_id"] == message.message_id:
-                    messages[i] = message.to_dict()
-                    break
-            
-            queue_file.write_text(
-                json.dumps(messages, ensure_ascii=False, indent=2),
-                encoding='utf-8'
-            )
-        except:
-            pass
+        records[message.message_id] = message.to_dict()
+        self._schedule_flush()
     
     def get_queue_size(self) -> int:
         return len(self._queue)
@@ -259,15 +292,8 @@ class MessageQueue:
         }
     
     async def load_persisted(self):
-        queue_file = self.data_dir / f"queue_{self.queue_name}.json"
-        
-        if not queue_file.exists():
-            return
-        
         try:
-            messages = json.loads(queue_file.read_text(encoding='utf-8'))
-            
-            for msg_data in messages:
+            for msg_data in self._load_records().values():
                 if msg_data["status"] in ["pending", "retry"]:
                     message = QueueMessage.from_dict(msg_data)
                     heapq.heappush(self._queue, message)
@@ -279,25 +305,17 @@ class MessageQueue:
             pass
     
     async def clear_completed(self):
-        queue_file = self.data_dir / f"queue_{self.queue_name}.json"
+        records = self._load_records()
         
-        if not queue_file.exists():
+        if not records:
             return
         
-        try:
-            messages = json.loads(queue_file.read_text(encoding='utf-8'))
-            
-            messages = [
-                m for m in messages
-                if m["status"] not in ["completed", "failed"]
-            ]
-            
-            queue_file.write_text(
-                json.dumps(messages, ensure_ascii=False, indent=2),
-                encoding='utf-8'
-            )
-        except:
-            pass
+        self._records = {
+            message_id: m for message_id, m in records.items()
+            if m["status"] not in ["completed", "failed"]
+        }
+        self._pending_writes += 1
+        self.flush()
 
 
 class QueueManager:
@@ -3,8 +3,10 @@ Message Router - 消息路由器
 硬编码路由规则，不可被LLM修改
 """
 import json
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Callable
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Optional, Any, Callable, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
@@ -54,7 +56,7 @@ HARDCODED_ROUTING_RULES = {
 }
 
 
-@dataclass
+@dataclass(slots=True)
 class RoutedMessage:
     message_id: str
     source: MessageSource
@@ -72,51 +74,54 @@ class MessageRouter:
     所有路由逻辑在此定义，不可被LLM修改
     """
     
-    HARDCODED_FLOWS = {
-        (MessageSource.SDF_COM, RouteType.INBOUND): [
+    HARDCODED_FLOWS = MappingProxyType({
+        (MessageSource.SDF_COM, RouteType.INBOUND): (
             "ncurses_parse",
             "message_queue_in",
             "sdfai_core",
             "llm_process",
             "message_queue_out",
             "target_im"
-        ],
-        (MessageSource.FEISHU, RouteType.INBOUND): [
+        ),
+        (MessageSource.FEISHU, RouteType.INBOUND): (
             "message_queue_in",
             "sdfai_core",
             "llm_process",
             "message_queue_out",
             "sdf_com"
-        ],
-        (MessageSource.SKILL, RouteType.INBOUND): [
+        ),
+        (MessageSource.SKILL, RouteType.INBOUND): (
             "standard_interface",
             "message_queue_in",
             "sdfai_core"
-        ]
-    }
+        )
+    })
+    
+    VALID_ROUTES: FrozenSet[Tuple[MessageSource, MessageTarget]] = frozenset({
+        (MessageSource.SDF_COM, MessageTarget.FEISHU),
+        (MessageSource.SDF_COM, MessageTarget.DINGTALK),
+        (MessageSource.SDF_COM, MessageTarget.ALL_IM),
+        (MessageSource.FEISHU, MessageTarget.SDF_COM),
+        (MessageSource.DINGTALK, MessageTarget.SDF_COM),
+        (MessageSource.SKILL, MessageTarget.ALL_IM),
+    })
+    
+    MAX_ROUTE_HISTORY = 100
     
     def __init__(self, data_dir: Path):
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        self._handlers: Dict[str, Callable] = {}
-        self._route_history: List[Dict] = []
+        self._handlers: Dict[str, Tuple[Callable, bool]] = {}
+        self._route_history: deque = deque(maxlen=self.MAX_ROUTE_HISTORY)
     
-    def get_route_flow(self, source: MessageSource, route_type: RouteType) -> List[str]:
-        return self.HARDCODED_FLOWS.get((source, route_type), [])
+    def get_route_flow(self, source: MessageSource, route_type: RouteType) -> Tuple[str, ...]:
+        return self.HARDCODED_FLOWS.get((source, route_type), ())
     
     def validate_route(self, source: MessageSource, target: MessageTarget) -> bool:
-        valid_routes = [
-            (MessageSource.SDF_COM, MessageTarget.FEISHU),
-            (MessageSource.SDF_COM, MessageTarget.DINGTALK),
-            (MessageSource.SDF_COM, MessageTarget.ALL_IM),
-            (MessageSource.FEISHU, MessageTarget.SDF_COM),
-            (MessageSource.DINGTALK, MessageTarget.SDF_COM),
-            (MessageSource.SKILL, MessageTarget.ALL_IM),
-        ]
-        return (source, target) in valid_routes
+        return (source, target) in self.VALID_ROUTES
     
     def register_handler(self, flow_step: str, handler: Callable):
-        self._handlers[flow_step] = handler
+        self._handlers[flow_step] = (handler, asyncio.iscoroutinefunction(handler))
     
     async def route(self, message: RoutedMessage) -> bool:
         flow = self.get_route_flow(message.source, message.route_type)
@@ -126,9 +131,9 @@ class MessageRouter:
         
         for step in flow:
             if step in self._handlers:
-                handler = self._handlers[step]
+                handler, is_coro = self._handlers[step]
                 try:
-                    if asyncio.iscoroutinefunction(handler):
+                    if is_coro:
                         message = await handler(message)
                     else:
                         message = handler(message)
@@ -140,12 +145,12 @@ class MessageRouter:
         self._log_route_success(message, flow)
         return True
     
-    def _log_route_success(self, message: RoutedMessage, flow: List[str]):
+    def _log_route_success(self, message: RoutedMessage, flow: Tuple[str, ...]):
         self._route_history.append({
             "message_id": message.message_id,
             "source": message.source.value,
             "target": message.target.value,
-            "flow": flow,
+            "flow": list(flow),
             "status": "success",
             "timestamp": datetime.now().isoformat()
         })
@@ -165,7 +170,7 @@ class MessageRouter:
     def _save_history(self):
         history_file = self.data_dir / "route_history.json"
         history_file.write_text(
-            json.dumps(self._route_history[-100:], ensure_ascii=False, indent=2),
+            json.dumps(list(self._route_history), ensure_ascii=False, indent=2),
             encoding='utf-8'
         )
     
@@ -3,6 +3,7 @@ NCurses Parser - NCurses终端解析器
 解析ncurses应用的输出，如top、htop、vim等
 """
 import re
+from functools import lru_cache
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
@@ -19,7 +20,7 @@ class ElementType(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(slots=True)
 class ScreenElement:
     element_type: ElementType
     content: str
@@ -29,7 +30,7 @@ class ScreenElement:
     children: List['ScreenElement'] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedScreen:
     raw_data: str
     elements: List[ScreenElement]
@@ -45,15 +46,70 @@ NCURSES_CURSOR = re.compile(r'\x1b\[[0-9]+;[0-9]+H')
 NCURSES_CLEAR = re.compile(r'\x1b\[[0-9]*J')
 NCURSES_ATTRS = re.compile(r'\x1b\[[0-9;]*[mHJKL]')
 
+TOP_LOAD_AVERAGE = re.compile(r'load average:\s*([\d.,\s]+)')
+TOP_CPU_USER = re.compile(r'%?Cpu\(s\):\s*([\d.]+)%?\s*us')
+TOP_MEMORY = re.compile(r'MiB?\s*Mem\s*:\s*([\d.]+)\s*total,\s*([\d.]+)\s*free')
+VIM_FILENAME = re.compile(r'"([^"]+)"')
+VIM_CURSOR = re.compile(r'(\d+),(\d+)')
+
+
+@lru_cache(maxsize=64)
+def _top_summary_fields(content: str) -> Tuple[Tuple[str, Any], ...]:
+    """解析top摘要行，相同内容的行直接命中缓存"""
+    fields = []
+    
+    load_match = TOP_LOAD_AVERAGE.search(content)
+    if load_match:
+        fields.append(("load_average", load_match.group(1).strip()))
+    
+    cpu_match = TOP_CPU_USER.search(content)
+    if cpu_match:
+        fields.append(("cpu_user", float(cpu_match.group(1))))
+    
+    mem_match = TOP_MEMORY.search(content)
+    if mem_match:
+        fields.append(("memory_total", float(mem_match.group(1))))
+        fields.append(("memory_free", float(mem_match.group(2))))
+    
+    return tuple(fields)
+
+
+@lru_cache(maxsize=64)
+def _vim_status_fields(content: str) -> Tuple[Optional[str], Optional[str], Optional[Tuple[int, int]]]:
+    """解析vim状态行，返回 (mode, filename, cursor)，未识别的字段为None"""
+    mode = None
+    if '-- INSERT --' in content:
+        mode = "insert"
+    elif '-- VISUAL --' in content:
+        mode = "visual"
+    elif '-- REPLACE --' in content:
+        mode = "replace"
+    
+    match = VIM_FILENAME.search(content)
+    filename = match.group(1) if match else None
+    
+    match = VIM_CURSOR.search(content)
+    cursor = (int(match.group(1)), int(match.group(2))) if match else None
+    
+    return mode, filename, cursor
+
 
 class NCursesParser:
-    """NCurses终端输出解析器"""
+    """NCurses终端输出解析器
+
+    parse() 复用同一个 ParsedScreen 及其 ScreenElement 对象池，
+    调用方需在下一次 parse() 之前消费完返回的屏幕数据。
+    """
     
     def __init__(self, width: int = 80, height: int = 24):
         self.width = width
         self.height = height
         self._screen_buffer: List[List[str]] = []
         self._clear_buffer()
+        self._elem_pool: List[ScreenElement] = [
+            ScreenElement(ElementType.TEXT, '') for _ in range(height)
+        ]
+        self._screen = ParsedScreen(raw_data='', elements=[], width=width, height=height)
     
     def _clear_buffer(self):
         self._screen_buffer = [[' ' for _ in range(self.width)] for _ in range(self.height)]
@@ -64,41 +120,42 @@ class NCursesParser:
         clean_data = self._strip_ansi(data)
         lines = clean_data.split('\n')
         
-        elements = []
+        screen = self._screen
+        screen.raw_data = data
+        screen.metadata.clear()
+        elements = screen.elements
+        elements.clear()
         for row, line in enumerate(lines[:self.height]):
             if line.strip():
                 element = self._parse_line(line, row)
                 elements.append(element)
         
-        return ParsedScreen(
-            raw_data=data,
-            elements=elements,
-            width=self.width,
-            height=self.height
-        )
+        return screen
     
     def _strip_ansi(self, data: str) -> str:
-        data = ANSI_ESCAPE.sub('', data)
-        data = ANSI_COLOR.sub('', data)
-        data = NCURSES_CURSOR.sub('', data)
-        data = NCURSES_CLEAR.sub('', data)
-        return data
+        # 无转义序列时直接返回，避免正则扫描
+        if '\x1b' not in data:
+            return data
+        # ANSI_ESCAPE 已覆盖颜色、光标定位和清屏序列，单次扫描即可
+        return ANSI_ESCAPE.sub('', data)
     
     def _parse_line(self, line: str, row: int) -> ScreenElement:
-        line = line[:self.width].ljust(self.width)
+        line = line[:self.width]
         
-        for col, char in enumerate(line):
-            if col < self.width:
-                self._screen_buffer[row][col] = char
+        # 缓冲区已由 _clear_buffer 填充空格，只需写入实际内容
+        self._screen_buffer[row][:len(line)] = line
         
         element_type = self._detect_element_type(line, row)
+        content = line.strip()
         
-        return ScreenElement(
-            element_type=element_type,
-            content=line.strip(),
-            position=(row, 0),
-            size=(1, len(line.strip()))
-        )
+        element = self._elem_pool[row]
+        element.element_type = element_type
+        element.content = content
+        element.position = (row, 0)
+        element.size = (1, len(content))
+        element.attributes.clear()
+        element.children.clear()
+        return element
     
     def _detect_element_type(self, line: str, row: int) -> ElementType:
         stripped = line.strip()
@@ -140,7 +197,7 @@ class NCursesParser:
         return rows
     
     def _parse_table_row(self, line: str) -> List[str]:
-        return [col.strip() for col in line.split() if col.strip()]
+        return line.split()
     
     def extract_menu_items(self, screen: ParsedScreen) -> List[Dict[str, str]]:
         items = []
@@ -175,20 +232,7 @@ class TopParser(NCursesParser):
         summary = {}
         
         for element in screen.elements[:5]:
-            content = element.content
-            
-            load_match = re.search(r'load average:\s*([\d.,\s]+)', content)
-            if load_match:
-                summary["load_average"] = load_match.group(1).strip()
-            
-            cpu_match = re.search(r'%?Cpu\(s\):\s*([\d.]+)%?\s*us', content)
-            if cpu_match:
-                summary["cpu_user"] = float(cpu_match.group(1))
-            
-            mem_match = re.search(r'MiB?\s*Mem\s*:\s*([\d.]+)\s*total,\s*([\d.]+)\s*free', content)
-            if mem_match:
-                summary["memory_total"] = float(mem_match.group(1))
-                summary["memory_free"] = float(mem_match.group(2))
+            summary.update(_top_summary_fields(element.content))
         
         return summary
     
@@ -235,26 +279,23 @@ class VimParser(NCursesParser):
     def _detect_mode(self, screen: ParsedScreen) -> str:
         for element in screen.elements:
             if element.element_type == ElementType.STATUS:
-                if '-- INSERT --' in element.content:
-                    return "insert"
-                elif '-- VISUAL --' in element.content:
-                    return "visual"
-                elif '-- REPLACE --' in element.content:
-                    return "replace"
+                mode = _vim_status_fields(element.content)[0]
+                if mode:
+                    return mode
         return "normal"
     
     def _detect_filename(self, screen: ParsedScreen) -> str:
         for element in screen.elements:
             if element.element_type == ElementType.STATUS:
-                match = re.search(r'"([^"]+)"', element.content)
-                if match:
-                    return match.group(1)
+                filename = _vim_status_fields(element.content)[1]
+                if filename:
+                    return filename
         return ""
     
     def _detect_cursor(self, screen: ParsedScreen) -> Dict:
         for element in screen.elements:
             if element.element_type == ElementType.STATUS:
-                match = re.search(r'(\d+),(\d+)', element.content)
-                if match:
-                    return {"line": int(match.group(1)), "col": int(match.group(2))}
+                cursor = _vim_status_fields(element.content)[2]
+                if cursor:
+                    return {"line": cursor[0], "col": cursor[1]}
         return {"line": 1, "col": 1}
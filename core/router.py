@@ -4,7 +4,7 @@ SDFAI Message Router - 消息路由器
 """
 import asyncio
 from pathlib import Path
-from typing import Dict, Optional, Any, Callable
+from typing import Dict, Optional, Any, Callable, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
@@ -24,7 +24,7 @@ class RouteType(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(slots=True)
 class RoutedMessage:
     route_type: RouteType
     prefix: str
@@ -34,76 +34,79 @@ class RoutedMessage:
 
 
 class MessageRouter:
+    PREFIX_TABLE: Dict[str, RouteType] = {
+        CommandPrefix.COM_MESSAGE: RouteType.COM_MESSAGE,
+        CommandPrefix.SHELL_COMMAND: RouteType.SHELL_COMMAND,
+        CommandPrefix.GO_ROOM: RouteType.GO_ROOM,
+        CommandPrefix.PRIVATE_MESSAGE: RouteType.PRIVATE_MESSAGE,
+    }
+    MAX_PREFIX_LEN = max(len(p) for p in PREFIX_TABLE)
+    
     def __init__(self, data_dir: Path):
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        self.handlers: Dict[RouteType, Callable] = {}
+        self.handlers: Dict[RouteType, Tuple[Callable, bool]] = {}
     
     def register_handler(self, route_type: RouteType, handler: Callable):
-        self.handlers[route_type] = handler
+        self.handlers[route_type] = (handler, asyncio.iscoroutinefunction(handler))
     
     def parse_message(self, message: str) -> RoutedMessage:
         message = message.strip()
         
-        if message.startswith(CommandPrefix.COM_MESSAGE):
-            content = message[len(CommandPrefix.COM_MESSAGE):].strip()
-            return RoutedMessage(
-                route_type=RouteType.COM_MESSAGE,
-                prefix=CommandPrefix.COM_MESSAGE,
-                content=content,
-                original=message
-            )
+        # 所有前缀均以':'结尾，按冒号位置切片后查表，避免逐个startswith
+        colon = message.find(':', 0, self.MAX_PREFIX_LEN)
+        route_type = self.PREFIX_TABLE.get(message[:colon + 1]) if colon >= 0 else None
         
-        elif message.startswith(CommandPrefix.SHELL_COMMAND):
-            content = message[len(CommandPrefix.SHELL_COMMAND):].strip()
+        if route_type is None:
             return RoutedMessage(
-                route_type=RouteType.SHELL_COMMAND,
-                prefix=CommandPrefix.SHELL_COMMAND,
-                content=content,
+                route_type=RouteType.UNKNOWN,
+                prefix="",
+                content=message,
                 original=message
             )
         
-        elif message.startswith(CommandPrefix.GO_ROOM):
-            content = message[len(CommandPrefix.GO_ROOM):].strip()
+        prefix = message[:colon + 1]
+        content = message[colon + 1:].strip()
+        
+        if route_type is RouteType.GO_ROOM:
             return RoutedMessage(
-                route_type=RouteType.GO_ROOM,
-                prefix=CommandPrefix.GO_ROOM,
+                route_type=route_type,
+                prefix=prefix,
                 content=content,
                 target=content,
                 original=message
             )
         
-        elif message.startswith(CommandPrefix.PRIVATE_MESSAGE):
-            content = message[len(CommandPrefix.PRIVATE_MESSAGE):].strip()
+        if route_type is RouteType.PRIVATE_MESSAGE:
             parts = content.split(maxsplit=1)
             target = parts[0] if parts else None
             msg_content = parts[1] if len(parts) > 1 else ""
             return RoutedMessage(
-                route_type=RouteType.PRIVATE_MESSAGE,
-                prefix=CommandPrefix.PRIVATE_MESSAGE,
+                route_type=route_type,
+                prefix=prefix,
                 content=msg_content,
                 target=target,
                 original=message
             )
         
         return RoutedMessage(
-            route_type=RouteType.UNKNOWN,
-            prefix="",
-            content=message,
+            route_type=route_type,
+            prefix=prefix,
+            content=content,
             original=message
         )
     
     async def route(self, message: str) -> Optional[Any]:
         routed = self.parse_message(message)
         
-        if routed.route_type in self.handlers:
-            handler = self.handlers[routed.route_type]
-            if asyncio.iscoroutinefunction(handler):
-                return await handler(routed)
-            else:
-                return handler(routed)
+        entry = self.handlers.get(routed.route_type)
+        if entry is None:
+            return None
         
-        return None
+        handler, is_coro = entry
+        if is_coro:
+            return await handler(routed)
+        return handler(routed)
     
     def get_prefix_help(self) -> str:
         return f"""
@@ -4,13 +4,19 @@ Security Evaluator - LLM安全评估器
 """
 import asyncio
 import json
-import re
+import time
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Callable
+from typing import Deque, Dict, List, Optional, Any, Callable, Set, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .security import SecurityManager, SecurityLevel
 from .stability import StabilityManager, StabilityStatus
 
@@ -22,14 +28,18 @@ class EvaluationAction(Enum):
     QUARANTINE = "quarantine"
 
 
-@dataclass
+@dataclass(slots=True)
 class EvaluationResult:
     action: EvaluationAction
     confidence: float
     risks: List[str]
     recommendations: List[str]
     details: str
-    timestamp: datetime = field(default_factory=datetime.now)
+    timestamp_ns: int = field(default_factory=time.time_ns)
+    
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9)
 
 
 SECURITY_EVALUATION_PROMPT = """
@@ -59,6 +69,121 @@ Respond in JSON format:
 """
 
 
+if orjson:
+    _json_loads = orjson.loads
+    
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+
+def _find_json_object(text: str) -> Optional[str]:
+    """单次扫描查找第一个括号平衡的JSON对象，跳过字符串内的括号"""
+    start = text.find('{')
+    if start < 0:
+        return None
+    
+    depth = 0
+    in_string = False
+    escape = False
+    
+    for i in range(start, len(text)):
+        char = text[i]
+        
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    
+    return None
+
+
+class _LLMBatcher:
+    """
+    LLM请求微批处理器
+    在 max_latency 时间窗口内到达的提示词合并为一批发送；
+    llm_client 声明 supports_batch 时以列表一次调用，否则并发逐条调用
+    """
+    
+    def __init__(self, llm_client: Callable, max_batch_size: int = 16, max_latency: float = 0.02):
+        self.llm_client = llm_client
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+    
+    async def submit(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_latency, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        
+        task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        prompts = [prompt for prompt, _ in batch]
+        
+        try:
+            if getattr(self.llm_client, "supports_batch", False):
+                try:
+                    responses = await self.llm_client(prompts)
+                    if not isinstance(responses, list) or len(responses) != len(batch):
+                        raise ValueError(f"Batch LLM client returned an invalid response for {len(batch)} prompts")
+                except Exception as e:
+                    responses = [e] * len(batch)
+            else:
+                responses = await asyncio.gather(
+                    *(self.llm_client(prompt) for prompt in prompts),
+                    return_exceptions=True
+                )
+            
+            for (_, future), response in zip(batch, responses):
+                if future.done():
+                    continue
+                if isinstance(response, BaseException):
+                    future.set_exception(response)
+                else:
+                    future.set_result(response)
+        finally:
+            # 取消或异常退出时，未完成的等待方也必须得到结果，否则 submit 会永久挂起
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("LLM batch dispatch did not complete"))
+
+
 class SecurityEvaluator:
     MIN_CONFIDENCE_THRESHOLD = 0.7
     
@@ -67,23 +192,25 @@ class SecurityEvaluator:
         data_dir: Path,
         security_manager: SecurityManager,
         stability_manager: StabilityManager,
-        llm_client: Callable = None
+        llm_client: Callable = None,
+        history_size: int = 1024
     ):
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.security_manager = security_manager
         self.stability_manager = stability_manager
         self.llm_client = llm_client
-        self.evaluation_history: List[Dict] = []
+        self.evaluation_history: Deque[Dict] = deque(maxlen=history_size)
+        self._llm_batcher: Optional[_LLMBatcher] = None
     
     async def evaluate_command(self, command: str, context: Dict = None) -> EvaluationResult:
         static_result = self.security_manager.evaluate_command(command)
         
-        if static_result in [SecurityLevel.CRITICAL, SecurityLevel.BLOCKED]:
+        if static_result >= SecurityLevel.CRITICAL:
             return EvaluationResult(
                 action=EvaluationAction.DENY,
                 confidence=1.0,
-                risks=[f"Static analysis detected {static_result.value} risk"],
+                risks=[f"Static analysis detected {static_result.name.lower()} risk"],
                 recommendations=["This command is not allowed"],
                 details=f"Blocked by security rule"
             )
@@ -114,10 +241,13 @@ class SecurityEvaluator:
         try:
             prompt = SECURITY_EVALUATION_PROMPT.format(
                 content=content[:2000],
-                context=json.dumps(context, ensure_ascii=False)
+                context=_json_dumps(context)
             )
             
-            response = await self.llm_client(prompt)
+            if self._llm_batcher is None or self._llm_batcher.llm_client is not self.llm_client:
+                self._llm_batcher = _LLMBatcher(self.llm_client)
+            
+            response = await self._llm_batcher.submit(prompt)
             result_data = self._parse_llm_response(response)
             
             return self._llm_result_to_evaluation(result_data)
@@ -132,10 +262,10 @@ class SecurityEvaluator:
             )
     
     def _parse_llm_response(self, response: str) -> Dict:
-        json_match = re.search(r'\{[\s\S]*\}', response)
-        if json_match:
+        json_text = _find_json_object(response)
+        if json_text:
             try:
-                return json.loads(json_match.group())
+                return _json_loads(json_text)
             except:
                 pass
         
@@ -4,9 +4,10 @@ Server Security Hardening - 服务器安全加强模块
 """
 import asyncio
 import json
-import subprocess
 import re
 import shutil
+import time
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Callable
 from dataclasses import dataclass, field
@@ -39,7 +40,7 @@ class OperationStatus(Enum):
     FAILED = "failed"
 
 
-@dataclass
+@dataclass(slots=True)
 class SecurityCheck:
     id: str
     category: SecurityCategory
@@ -52,9 +53,15 @@ class SecurityCheck:
     auto_fix: bool = False
     fix_command: str = ""
     requires_confirm: bool = True
+    evaluator: Optional[Callable[[str], bool]] = field(default=None, repr=False, compare=False)
+    
+    def evaluate(self, result: str) -> bool:
+        if self.evaluator is not None:
+            return self.evaluator(result)
+        return self.expected_result.lower() in result.lower()
 
 
-@dataclass
+@dataclass(slots=True)
 class PendingOperation:
     operation_id: str
     operation_type: str
@@ -62,10 +69,23 @@ class PendingOperation:
     command: str
     rollback_command: str
     risk_level: RiskLevel
-    created_at: datetime
+    created_at_ns: int = field(default_factory=time.time_ns)
     status: OperationStatus = OperationStatus.PENDING
     confirmed_by: Optional[str] = None
     requires_sudo: bool = False
+    output: str = ""
+    
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created_at_ns / 1e9)
+
+
+def _ssh_root_login_disabled(result: str) -> bool:
+    return "no" in result.lower() or result.strip() == ""
+
+
+def _firewall_active(result: str) -> bool:
+    return "active" in result.lower()
 
 
 SAFE_SECURITY_CHECKS: List[SecurityCheck] = [
@@ -80,7 +100,8 @@ SAFE_SECURITY_CHECKS: List[SecurityCheck] = [
         risk_level=RiskLevel.HIGH,
         auto_fix=True,
         fix_command="sed -i 's/^#*PermitRootLogin.*/PermitRootLogin no/' /etc/ssh/sshd_config",
-        requires_confirm=True
+        requires_confirm=True,
+        evaluator=_ssh_root_login_disabled
     ),
     SecurityCheck(
         id="FW001",
@@ -93,25 +114,47 @@ SAFE_SECURITY_CHECKS: List[SecurityCheck] = [
         risk_level=RiskLevel.HIGH,
         auto_fix=True,
         fix_command="ufw --force enable",
-        requires_confirm=True
+        requires_confirm=True,
+        evaluator=_firewall_active
     ),
 ]
 
 
+SSHD_CONFIG_PATH = Path("/etc/ssh/sshd_config")
+PERMIT_ROOT_LOGIN_PATTERN = re.compile(r'^#?PermitRootLogin.*$', re.MULTILINE)
+SUDO_REQUIRED_PATTERN = re.compile(r'/etc/|systemctl|ufw|apt|chmod|chown')
+CHECK_TIMEOUT = 30
+EXECUTE_TIMEOUT = 120
+OUTPUT_LIMIT = 16384
+
+
+@lru_cache(maxsize=8)
+def _read_permit_root_login(path: str, mtime_ns: int) -> str:
+    """读取sshd_config中的PermitRootLogin行，按文件修改时间缓存"""
+    try:
+        text = Path(path).read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return "not_found"
+    lines = PERMIT_ROOT_LOGIN_PATTERN.findall(text)
+    return "\n".join(lines) if lines else "not_found"
+
+
 class ServerSecurityHardening:
     def __init__(self, data_dir: Path, im_notifier: Callable = None):
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.im_notifier = im_notifier
         self.pending_operations: Dict[str, PendingOperation] = {}
+        self._probes: Dict[str, Callable] = {
+            "AUTH001": self._probe_ssh_root_login,
+            "FW001": self._probe_firewall,
+        }
     
     async def run_assessment(self) -> Dict:
-        findings = []
-        
-        for check in SAFE_SECURITY_CHECKS:
-            finding = await self._run_check(check)
-            if finding:
-                findings.append(finding)
+        results = await asyncio.gather(
+            *(self._run_check(check) for check in SAFE_SECURITY_CHECKS)
+        )
+        findings = [finding for finding in results if finding]
         
         return {
             "timestamp": datetime.now().isoformat(),
@@ -121,15 +164,16 @@ class ServerSecurityHardening:
     
     async def _run_check(self, check: SecurityCheck) -> Optional[Dict]:
         try:
-            result = subprocess.run(
-                check.check_command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            probe = self._probes.get(check.id)
+            if probe:
+                current_state = await probe()
+            else:
+                current_state = await self._probe_shell(check.check_command)
             
-            current_state = result.stdout.strip()
+            if current_state is None:
+                return None
+            
+            current_state = current_state.strip()
             passed = self._evaluate_check_result(check, current_state)
             
             if not passed:
@@ -149,19 +193,91 @@ class ServerSecurityHardening:
         except Exception as e:
             return None
     
+    async def _probe_ssh_root_login(self) -> Optional[str]:
+        try:
+            mtime_ns = SSHD_CONFIG_PATH.stat().st_mtime_ns
+        except OSError:
+            return "not_found"
+        return _read_permit_root_login(str(SSHD_CONFIG_PATH), mtime_ns)
+    
+    async def _probe_firewall(self) -> Optional[str]:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "ufw", "status",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        except OSError:
+            return "ufw_not_installed"
+        
+        stdout = await self._communicate(proc)
+        if stdout is None:
+            return None
+        
+        output = stdout.decode(errors='replace')
+        if proc.returncode != 0:
+            output += "ufw_not_installed"
+        return output
+    
+    async def _probe_shell(self, command: str) -> Optional[str]:
+        proc = await asyncio.create_subprocess_shell(
+            command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout = await self._communicate(proc)
+        return stdout.decode(errors='replace') if stdout is not None else None
+    
+    async def _communicate(
+        self,
+        proc: asyncio.subprocess.Process,
+        timeout: float = CHECK_TIMEOUT,
+        stdin_data: bytes = None
+    ) -> Optional[bytes]:
+        """流式读取子进程输出，stdout 最多保留 OUTPUT_LIMIT 字节，stderr 直接丢弃"""
+        async def read_capped(stream: Optional[asyncio.StreamReader], limit: int) -> bytes:
+            chunks = []
+            size = 0
+            if stream is None:
+                return b""
+            while True:
+                chunk = await stream.read(4096)
+                if not chunk:
+                    break
+                if size < limit:
+                    chunk = chunk[:limit - size]
+                    chunks.append(chunk)
+                    size += len(chunk)
+            return b"".join(chunks)
+        
+        async def run() -> bytes:
+            if stdin_data is not None and proc.stdin is not None:
+                proc.stdin.write(stdin_data)
+                await proc.stdin.drain()
+                proc.stdin.close()
+            stdout, _ = await asyncio.gather(
+                read_capped(proc.stdout, OUTPUT_LIMIT),
+                read_capped(proc.stderr, 0)
+            )
+            await proc.wait()
+            return stdout
+        
+        try:
+            return await asyncio.wait_for(run(), timeout=timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return None
+    
     def _evaluate_check_result(self, check: SecurityCheck, result: str) -> bool:
-        if check.id == "AUTH001":
-            return "no" in result.lower() or result.strip() == ""
-        elif check.id == "FW001":
-            return "active" in result.lower()
-        return True
+        return check.evaluate(result)
     
     async def request_fix(self, finding_id: str) -> Optional[str]:
         check = next((c for c in SAFE_SECURITY_CHECKS if c.id == finding_id), None)
         if not check or not check.auto_fix:
             return None
         
-        operation_id = f"op_{datetime.now().strftime('%Y%m%d%H%M%S')}_{finding_id}"
+        operation_id = f"op_{time.time_ns()}_{finding_id}"
         
         operation = PendingOperation(
             operation_id=operation_id,
@@ -170,7 +286,6 @@ class ServerSecurityHardening:
             command=check.fix_command,
             rollback_command="",
             risk_level=check.risk_level,
-            created_at=datetime.now(),
             requires_sudo=self._check_requires_sudo(check.fix_command)
         )
         
@@ -181,8 +296,7 @@ class ServerSecurityHardening:
         return operation_id
     
     def _check_requires_sudo(self, command: str) -> bool:
-        sudo_patterns = ["/etc/", "systemctl", "ufw", "apt", "chmod", "chown"]
-        return any(p in command for p in sudo_patterns)
+        return SUDO_REQUIRED_PATTERN.search(command) is not None
     
     async def _request_user_confirmation(self, operation: PendingOperation):
         if self.im_notifier:
@@ -223,20 +337,32 @@ class ServerSecurityHardening:
     
     async def _execute_operation(self, operation: PendingOperation, sudo_password: str = None) -> bool:
         try:
-            command = operation.command
-            
             if operation.requires_sudo and sudo_password:
-                command = f"echo '{sudo_password}' | sudo -S {operation.command}"
+                # 密码经stdin传给sudo，不出现在命令行或进程参数中
+                proc = await asyncio.create_subprocess_exec(
+                    "sudo", "-S", "-p", "", "sh", "-c", operation.command,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT
+                )
+                stdin_data = (sudo_password + "\n").encode()
+            else:
+                proc = await asyncio.create_subprocess_shell(
+                    operation.command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT
+                )
+                stdin_data = None
             
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
+            output = await self._communicate(proc, timeout=EXECUTE_TIMEOUT, stdin_data=stdin_data)
+            
+            if output is None:
+                operation.status = OperationStatus.FAILED
+                return False
+            
+            operation.output = output.decode(errors='replace')
             
-            if result.returncode == 0:
+            if proc.returncode == 0:
                 operation.status = OperationStatus.COMPLETED
                 return True
             else:
@@ -4,23 +4,25 @@ Security Manager - 安全管理器
 """
 import re
 import json
+from collections import deque
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Set
+from typing import Deque, Dict, List, Optional, Any, Set
 from dataclasses import dataclass, field
-from enum import Enum
+from enum import IntEnum
 from datetime import datetime
 
 
-class SecurityLevel(Enum):
-    SAFE = "safe"
-    LOW_RISK = "low_risk"
-    MEDIUM_RISK = "medium_risk"
-    HIGH_RISK = "high_risk"
-    CRITICAL = "critical"
-    BLOCKED = "blocked"
+class SecurityLevel(IntEnum):
+    SAFE = 0
+    LOW_RISK = 1
+    MEDIUM_RISK = 2
+    HIGH_RISK = 3
+    CRITICAL = 4
+    BLOCKED = 5
 
 
-@dataclass
+@dataclass(slots=True)
 class SecurityRule:
     name: str
     pattern: str
@@ -82,27 +84,45 @@ HARDCODED_SECURITY_RULES: List[SecurityRule] = [
     ),
 ]
 
+# 导入时将全部规则按风险等级从高到低合并为一个正则。每个分支包在零宽先行断言中，
+# finditer 会在每个起始位置报告该处命中的最高等级规则，不会因匹配重叠而漏检
+_SORTED_RULES = sorted(HARDCODED_SECURITY_RULES, key=lambda rule: rule.level, reverse=True)
+_RULE_LEVELS = {f"r{i}": rule.level for i, rule in enumerate(_SORTED_RULES)}
+_COMBINED_RULES = re.compile(
+    "|".join(f"(?=(?P<r{i}>{rule.pattern}))" for i, rule in enumerate(_SORTED_RULES)),
+    re.IGNORECASE
+)
+_MAX_RULE_LEVEL = max((rule.level for rule in _SORTED_RULES), default=SecurityLevel.SAFE)
+
+
+@lru_cache(maxsize=4096)
+def _evaluate_static(command: str) -> SecurityLevel:
+    """静态规则评估，仅依赖命令字符串，结果可缓存"""
+    highest_risk = SecurityLevel.SAFE
+    
+    for match in _COMBINED_RULES.finditer(command):
+        level = _RULE_LEVELS[match.lastgroup]
+        if level > highest_risk:
+            highest_risk = level
+            if highest_risk == _MAX_RULE_LEVEL:
+                break
+    
+    return highest_risk
+
 
 class SecurityManager:
-    def __init__(self, data_dir: Path):
+    def __init__(self, data_dir: Path, audit_log_size: int = 4096):
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.command_rules = HARDCODED_SECURITY_RULES
-        self.audit_log: List[Dict] = []
+        self.audit_log: Deque[Dict] = deque(maxlen=audit_log_size)
     
     def evaluate_command(self, command: str) -> SecurityLevel:
-        highest_risk = SecurityLevel.SAFE
-        
-        for rule in self.command_rules:
-            if re.search(rule.pattern, command, re.IGNORECASE):
-                if self._compare_levels(rule.level, highest_risk) > 0:
-                    highest_risk = rule.level
-        
-        return highest_risk
+        return _evaluate_static(command)
     
     def is_allowed(self, command: str, context: Dict = None) -> bool:
         level = self.evaluate_command(command)
-        return level not in [SecurityLevel.CRITICAL, SecurityLevel.BLOCKED]
+        return level < SecurityLevel.CRITICAL
     
     def needs_confirmation(self, command: str) -> bool:
         level = self.evaluate_command(command)
@@ -118,14 +138,3 @@ class SecurityManager:
             SecurityLevel.BLOCKED: "block"
         }
         return actions.get(level, "block")
-    
-    def _compare_levels(self, a: SecurityLevel, b: SecurityLevel) -> int:
-        levels = {
-            SecurityLevel.SAFE: 0,
-            SecurityLevel.LOW_RISK: 1,
-            SecurityLevel.MEDIUM_RISK: 2,
-            SecurityLevel.HIGH_RISK: 3,
-            SecurityLevel.CRITICAL: 4,
-            SecurityLevel.BLOCKED: 5
-        }
-        return levels.get(a, 0) - levels.get(b, 0)
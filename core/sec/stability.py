@@ -4,8 +4,11 @@ Stability Manager - 稳定性管理器
 """
 import asyncio
 import json
+import time
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, Optional, Any
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
@@ -23,16 +26,20 @@ class StabilityStatus(Enum):
     EMERGENCY = "emergency"
 
 
-@dataclass
+@dataclass(slots=True)
 class SystemMetrics:
     cpu_percent: float
     memory_percent: float
     disk_percent: float
     process_count: int
-    timestamp: datetime = field(default_factory=datetime.now)
+    timestamp_ns: int = field(default_factory=time.time_ns)
+    
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9)
 
 
-@dataclass
+@dataclass(slots=True)
 class StabilityThreshold:
     cpu_warning: float = 80.0
     cpu_critical: float = 95.0
@@ -43,28 +50,65 @@ class StabilityThreshold:
 
 
 class StabilityManager:
-    def __init__(self, data_dir: Path, thresholds: StabilityThreshold = None):
+    METRICS_TTL = 0.5
+    DISK_PATH = '/'
+    
+    def __init__(
+        self,
+        data_dir: Path,
+        thresholds: StabilityThreshold = None,
+        history_size: int = 2048
+    ):
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.thresholds = thresholds or StabilityThreshold()
-        self.metrics_history: List[SystemMetrics] = []
+        self.metrics_history: Deque[SystemMetrics] = deque(maxlen=history_size)
         self._monitoring = False
+        self._last_metrics: Optional[SystemMetrics] = None
+        self._last_metrics_ts = 0.0
+        
+        if psutil:
+            # 预热非阻塞CPU采样，后续调用返回距上次调用的使用率
+            psutil.cpu_percent(interval=None)
     
     def get_current_metrics(self) -> SystemMetrics:
+        now = time.monotonic()
+        if self._last_metrics is not None and now - self._last_metrics_ts < self.METRICS_TTL:
+            return self._last_metrics
+        
         if psutil:
-            cpu = psutil.cpu_percent(interval=0.1)
+            cpu = psutil.cpu_percent(interval=None)
             memory = psutil.virtual_memory().percent
-            disk = psutil.disk_usage('/').percent if psutil.disk_usage('/') else 0
+            disk_usage = psutil.disk_usage(self.DISK_PATH)
+            disk = disk_usage.percent if disk_usage else 0
             process_count = len(psutil.pids())
         else:
             cpu, memory, disk, process_count = 0, 0, 0, 0
         
-        return SystemMetrics(
+        self._last_metrics = SystemMetrics(
             cpu_percent=cpu,
             memory_percent=memory,
             disk_percent=disk,
             process_count=process_count
         )
+        self._last_metrics_ts = now
+        self.metrics_history.append(self._last_metrics)
+        return self._last_metrics
+    
+    def rolling_max(self, window: int = 60) -> Optional[SystemMetrics]:
+        """最近 window 个采样中各项指标的最大值，无采样时返回None"""
+        count = min(window, len(self.metrics_history))
+        if count <= 0:
+            return None
+        
+        samples = list(islice(reversed(self.metrics_history), count))
+        return SystemMetrics(
+            cpu_percent=max(m.cpu_percent for m in samples),
+            memory_percent=max(m.memory_percent for m in samples),
+            disk_percent=max(m.disk_percent for m in samples),
+            process_count=max(m.process_count for m in samples),
+            timestamp_ns=samples[0].timestamp_ns
+        )
     
     def evaluate_stability(self, metrics: SystemMetrics = None) -> StabilityStatus:
         if metrics is None:
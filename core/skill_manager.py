@@ -3,21 +3,31 @@ SDFAI Skill Manager - 技能管理器
 """
 import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Tuple
 from datetime import datetime
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 from .skill_translator import SDFAISkill, OpenClawTranslator
 from .skill_parser import SkillParser
 
 
 class SkillManager:
+    LOAD_WORKERS = 8
+    
     def __init__(self, skills_dir: Path):
         self.skills_dir = skills_dir
         self.translator = OpenClawTranslator(skills_dir)
         self.parser = SkillParser()
         self.skills: Dict[str, SDFAISkill] = {}
         self.handlers: Dict[str, Callable] = {}
+        self._triggers: List[Tuple[str, str, str]] = []
+        self._automaton = None
         self._load_skills()
     
     def _load_skills(self):
@@ -25,17 +35,43 @@ class SkillManager:
         if not installed_dir.exists():
             return
         
-        for skill_dir in installed_dir.iterdir():
-            if skill_dir.is_dir():
-                skill = self.parser.parse_file(skill_dir / "skill.json")
-                if skill:
-                    self.skills[skill.name.lower().replace(' ', '_')] = skill
+        skill_files = [d / "skill.json" for d in installed_dir.iterdir() if d.is_dir()]
+        
+        with ThreadPoolExecutor(max_workers=self.LOAD_WORKERS) as pool:
+            parsed = list(pool.map(self.parser.parse_file, skill_files))
+        
+        for skill in parsed:
+            if skill:
+                self.skills[skill.name_key] = skill
+        
+        self._build_trigger_index()
+    
+    def _build_trigger_index(self):
+        """按技能和触发词顺序建立索引，有 pyahocorasick 时构建自动机"""
+        self._triggers = [
+            (key, trigger, trigger.lower())
+            for key, skill in self.skills.items()
+            for trigger in skill.triggers
+        ]
+        
+        self._automaton = None
+        if ahocorasick is None or any(not t[2] for t in self._triggers):
+            return
+        
+        automaton = ahocorasick.Automaton()
+        for index, (_, _, trigger_lower) in enumerate(self._triggers):
+            if trigger_lower not in automaton:
+                automaton.add_word(trigger_lower, index)
+        if len(automaton):
+            automaton.make_automaton()
+            self._automaton = automaton
     
     def install_skill(self, source_path: Path) -> Optional[str]:
         skill = self.translator.install_skill(source_path)
         if skill:
-            key = skill.name.lower().replace(' ', '_')
+            key = skill.name_key
             self.skills[key] = skill
+            self._build_trigger_index()
             return key
         return None
     
@@ -61,10 +97,17 @@ class SkillManager:
     def match_trigger(self, text: str) -> Optional[tuple]:
         text_lower = text.lower()
         
-        for key, skill in self.skills.items():
-            for trigger in skill.triggers:
-                if trigger.lower() in text_lower:
-                    return (key, trigger, skill)
+        if self._automaton is not None:
+            # 单次扫描文本，取索引最小者以保持原有的技能/触发词优先级
+            index = min((i for _, i in self._automaton.iter(text_lower)), default=None)
+            if index is None:
+                return None
+            key, trigger, _ = self._triggers[index]
+            return (key, trigger, self.skills[key])
+        
+        for key, trigger, trigger_lower in self._triggers:
+            if trigger_lower in text_lower:
+                return (key, trigger, self.skills[key])
         
         return None
     
@@ -3,27 +3,41 @@ SDFAI Skill Parser - 解析SDFAI原生技能格式
 """
 import re
 import json
+from bisect import bisect_left
+from itertools import accumulate
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .skill_translator import SDFAISkill
 
+_json_loads = orjson.loads if orjson else json.loads
+
 
 class SkillParser:
     SDFAI_PATTERNS = {
-        'skill_name': r'^#\s+(.+)$',
-        'version': r'^-\s+Version:\s*(.+)$',
-        'description': r'^-\s+Description:\s*(.+)$',
-        'source': r'^-\s+Source:\s*(.+)$',
-        'triggers_section': r'^##\s+Triggers\s*$',
-        'actions_section': r'^##\s+Actions\s*$',
-        'list_item': r'^-\s+`?(.+?)`?\s*$',
-        'json_block': r'```json\s*\n(.+?)\n```',
+        'skill_name': re.compile(r'^#\s+(.+)$'),
+        'version': re.compile(r'^-\s+Version:\s*(.+)$'),
+        'description': re.compile(r'^-\s+Description:\s*(.+)$'),
+        'source': re.compile(r'^-\s+Source:\s*(.+)$'),
+        'triggers_section': re.compile(r'^##\s+Triggers\s*$'),
+        'actions_section': re.compile(r'^##\s+Actions\s*$'),
+        'list_item': re.compile(r'^-\s+`?(.+?)`?\s*$'),
+        'json_block': re.compile(r'```json\s*\n(.+?)\n```', re.DOTALL),
     }
     
     def parse_markdown(self, content: str) -> Optional[SDFAISkill]:
         lines = content.split('\n')
+        line_starts = list(accumulate((len(line) + 1 for line in lines), initial=0))
+        
+        # 预先扫描一次所有JSON代码块，按起始位置排序，供 Action 标题定位
+        json_blocks = list(self.SDFAI_PATTERNS['json_block'].finditer(content))
+        json_block_starts = [m.start() for m in json_blocks]
         
         name = None
         version = "1.0.0"
@@ -35,7 +49,7 @@ class SkillParser:
         current_section = None
         
         for i, line in enumerate(lines):
-            name_match = re.match(self.SDAI_PATTERNS['skill_name'], line)
+            name_match = self.SDFAI_PATTERNS['skill_name'].match(line)
             if name_match and name is None:
                 name = name_match.group(1).strip()
                 continue
@@ -61,17 +75,17 @@ class SkillParser:
                 continue
             
             if current_section == 'triggers':
-                item_match = re.match(self.SDAI_PATTERNS['list_item'], line)
+                item_match = self.SDFAI_PATTERNS['list_item'].match(line)
                 if item_match:
                     triggers.append(item_match.group(1).strip())
             
-            if current_section == 'actions':
-                json_match = re.search(self.SDAI_PATTERNS['json_block'], content[content.find(line):], re.DOTALL)
-                if json_match and 'Action' in line:
+            if current_section == 'actions' and 'Action' in line:
+                index = bisect_left(json_block_starts, line_starts[i])
+                if index < len(json_blocks):
                     try:
-                        action_data = json.loads(json_match.group(1))
+                        action_data = json.loads(json_blocks[index].group(1))
                         actions.append(action_data)
-                    except:
+                    except ValueError:
                         pass
         
         if name is None:
@@ -86,9 +100,9 @@ class SkillParser:
             source_format=source_format
         )
     
-    def parse_json(self, content: str) -> Optional[SDFAISkill]:
+    def parse_json(self, content: Union[str, bytes]) -> Optional[SDFAISkill]:
         try:
-            data = json.loads(content)
+            data = _json_loads(content)
             return SDFAISkill(
                 name=data["name"],
                 version=data.get("version", "1.0.0"),
@@ -99,18 +113,17 @@ class SkillParser:
                 source_format=data.get("source_format", "sdfai"),
                 created_at=datetime.fromisoformat(data["created_at"]) if "created_at" in data else datetime.now()
             )
-        except:
+        except (ValueError, KeyError, TypeError, AttributeError):
             return None
     
     def parse_file(self, path: Path) -> Optional[SDFAISkill]:
         if not path.exists():
             return None
         
-        content = path.read_text(encoding='utf-8')
-        
+        # JSON直接交给解析器处理字节，省去一次str解码
         if path.suffix == '.json':
-            return self.parse_json(content)
+            return self.parse_json(path.read_bytes())
         elif path.suffix == '.md':
-            return self.parse_markdown(content)
+            return self.parse_markdown(path.read_text(encoding='utf-8'))
         
         return None
@@ -6,11 +6,50 @@ import json
 import shutil
 from pathlib import Path
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-@dataclass
+if orjson:
+    _json_loads = orjson.loads
+    
+    def _json_dumps_indent(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    
+    def _json_dump_bytes(obj: Any) -> bytes:
+        return orjson.dumps(
+            obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        )
+else:
+    _json_loads = json.loads
+    
+    def _json_dumps_indent(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    
+    def _json_dump_bytes(obj: Any) -> bytes:
+        return (json.dumps(obj, ensure_ascii=False, indent=2) + '\n').encode('utf-8')
+
+_BULLET_PREFIX = re.compile(r'^[-*]\s+')
+
+
+def _compile_sections(*sections: str) -> re.Pattern:
+    """标题、描述及列表段合并为单个模式，一次finditer取出全部字段"""
+    branches = [
+        r'^#[^\S\n]+(?P<name>[^\n]+)$',
+        r'^##\s+Description\s*\n(?P<description>.+?)(?=\n##|\Z)',
+    ]
+    for section in sections:
+        branches.append(
+            rf'^##\s+{section.capitalize()}\s*\n(?P<{section}>(?:[-*]\s+[^\n]+\n?)+)'
+        )
+    return re.compile('|'.join(branches), re.MULTILINE | re.DOTALL)
+
+
+@dataclass(slots=True)
 class SDFAISkill:
     name: str
     version: str
@@ -20,31 +59,35 @@ class SDFAISkill:
     metadata: Dict[str, Any] = field(default_factory=dict)
     source_format: str = "sdfai"
     created_at: datetime = field(default_factory=datetime.now)
+    name_key: str = field(init=False, repr=False, compare=False)
+    created_iso: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.name_key = self.name.lower().replace(' ', '_')
+        self.created_iso = self.created_at.isoformat()
     
     def to_markdown(self) -> str:
-        md = f"""# {self.name}
+        parts = [f"""# {self.name}
 
 ## Metadata
 - Version: {self.version}
 - Description: {self.description}
 - Source: {self.source_format}
-- Created: {self.created_at.isoformat()}
+- Created: {self.created_iso}
 
 ## Triggers
-"""
-        for trigger in self.triggers:
-            md += f"- `{trigger}`\n"
+"""]
+        parts.extend(f"- `{trigger}`\n" for trigger in self.triggers)
         
-        md += "\n## Actions\n"
+        parts.append("\n## Actions\n")
         for i, action in enumerate(self.actions, 1):
-            md += f"\n### Action {i}\n"
-            md += f"```json\n{json.dumps(action, ensure_ascii=False, indent=2)}\n```\n"
+            parts.append(f"\n### Action {i}\n```json\n{_json_dumps_indent(action)}\n```\n")
         
         if self.metadata:
-            md += "\n## Additional Metadata\n"
-            md += f"```json\n{json.dumps(self.metadata, ensure_ascii=False, indent=2)}\n```\n"
+            parts.append("\n## Additional Metadata\n")
+            parts.append(f"```json\n{_json_dumps_indent(self.metadata)}\n```\n")
         
-        return md
+        return "".join(parts)
     
     def to_json(self) -> dict:
         return {
@@ -55,24 +98,13 @@ class SDFAISkill:
             "actions": self.actions,
             "metadata": self.metadata,
             "source_format": self.source_format,
-            "created_at": self.created_at.isoformat()
+            "created_at": self.created_iso
         }
 
 
 class OpenClawTranslator:
-    OPENCLAW_PATTERNS = {
-        'skill_name': r'^#\s+(.+)$',
-        'description': r'^##\s+Description\s*\n(.+?)(?=\n##|\Z)',
-        'triggers': r'^##\s+Triggers\s*\n((?:[-*]\s+.+\n?)+)',
-        'actions': r'^##\s+Actions\s*\n((?:[-*]\s+.+\n?)+)',
-    }
-    
-    NANOBOT_PATTERNS = {
-        'skill_name': r'^#\s+(.+)$',
-        'description': r'^##\s+Description\s*\n(.+?)(?=\n##|\Z)',
-        'commands': r'^##\s+Commands\s*\n((?:[-*]\s+.+\n?)+)',
-        'responses': r'^##\s+Responses\s*\n((?:[-*]\s+.+\n?)+)',
-    }
+    OPENCLAW_PATTERN = _compile_sections('triggers', 'actions')
+    NANOBOT_PATTERN = _compile_sections('commands', 'responses')
     
     def __init__(self, skills_dir: Path):
         self.skills_dir = skills_dir
@@ -83,44 +115,51 @@ class OpenClawTranslator:
         self.installed_dir.mkdir(exist_ok=True)
     
     def detect_format(self, content: str) -> str:
+        return self._detect(content)[0]
+    
+    def _detect(self, content: str) -> Tuple[str, Optional[Dict]]:
+        """识别格式，JSON格式同时返回已解析的数据供translate复用"""
         if '## Triggers' in content and '## Actions' in content:
-            return 'openclaw'
+            return 'openclaw', None
         elif '## Commands' in content or '## Responses' in content:
-            return 'nanobot'
-        elif content.strip().startswith('{'):
+            return 'nanobot', None
+        stripped = content.strip()
+        if stripped.startswith('{') and stripped.endswith('}'):
             try:
-                json.loads(content)
-                return 'json'
-            except:
+                return 'json', _json_loads(content)
+            except ValueError:
                 pass
-        return 'sdfai'
+        return 'sdfai', None
+    
+    def _scan_sections(self, pattern: re.Pattern, content: str) -> Dict[str, str]:
+        """单次扫描，每个字段只保留首次出现的内容"""
+        found: Dict[str, str] = {}
+        total = len(pattern.groupindex)
+        for match in pattern.finditer(content):
+            key = match.lastgroup
+            if key not in found:
+                found[key] = match.group(key)
+                if len(found) == total:
+                    break
+        return found
     
     def parse_openclaw(self, content: str) -> SDFAISkill:
-        lines = content.split('\n')
+        sections = self._scan_sections(self.OPENCLAW_PATTERN, content)
         
-        name = "Unknown Skill"
-        for line in lines:
-            match = re.match(self.OPENCLAW_PATTERNS['skill_name'], line)
-            if match:
-                name = match.group(1).strip()
-                break
-        
-        desc_match = re.search(self.OPENCLAW_PATTERNS['description'], content, re.MULTILINE | re.DOTALL)
-        description = desc_match.group(1).strip() if desc_match else ""
+        name = sections['name'].strip() if 'name' in sections else "Unknown Skill"
+        description = sections.get('description', "").strip()
         
         triggers = []
-        triggers_match = re.search(self.OPENCLAW_PATTERNS['triggers'], content, re.MULTILINE)
-        if triggers_match:
-            for line in triggers_match.group(1).strip().split('\n'):
-                trigger = re.sub(r'^[-*]\s+', '', line).strip()
+        if 'triggers' in sections:
+            for line in sections['triggers'].strip().split('\n'):
+                trigger = _BULLET_PREFIX.sub('', line).strip()
                 if trigger:
                     triggers.append(trigger)
         
         actions = []
-        actions_match = re.search(self.OPENCLAW_PATTERNS['actions'], content, re.MULTILINE)
-        if actions_match:
-            for line in actions_match.group(1).strip().split('\n'):
-                action_str = re.sub(r'^[-*]\s+', '', line).strip()
+        if 'actions' in sections:
+            for line in sections['actions'].strip().split('\n'):
+                action_str = _BULLET_PREFIX.sub('', line).strip()
                 if action_str:
                     actions.append({"type": "execute", "command": action_str})
         
@@ -134,31 +173,22 @@ class OpenClawTranslator:
         )
     
     def parse_nanobot(self, content: str) -> SDFAISkill:
-        lines = content.split('\n')
-        
-        name = "Unknown Skill"
-        for line in lines:
-            match = re.match(self.NANOBOT_PATTERNS['skill_name'], line)
-            if match:
-                name = match.group(1).strip()
-                break
+        sections = self._scan_sections(self.NANOBOT_PATTERN, content)
         
-        desc_match = re.search(self.NANOBOT_PATTERNS['description'], content, re.MULTILINE | re.DOTALL)
-        description = desc_match.group(1).strip() if desc_match else ""
+        name = sections['name'].strip() if 'name' in sections else "Unknown Skill"
+        description = sections.get('description', "").strip()
         
         triggers = []
-        commands_match = re.search(self.NANOBOT_PATTERNS['commands'], content, re.MULTILINE)
-        if commands_match:
-            for line in commands_match.group(1).strip().split('\n'):
-                cmd = re.sub(r'^[-*]\s+', '', line).strip()
+        if 'commands' in sections:
+            for line in sections['commands'].strip().split('\n'):
+                cmd = _BULLET_PREFIX.sub('', line).strip()
                 if cmd:
                     triggers.append(cmd)
         
         actions = []
-        responses_match = re.search(self.NANOBOT_PATTERNS['responses'], content, re.MULTILINE)
-        if responses_match:
-            for line in responses_match.group(1).strip().split('\n'):
-                resp = re.sub(r'^[-*]\s+', '', line).strip()
+        if 'responses' in sections:
+            for line in sections['responses'].strip().split('\n'):
+                resp = _BULLET_PREFIX.sub('', line).strip()
                 if resp:
                     actions.append({"type": "respond", "text": resp})
         
@@ -172,7 +202,9 @@ class OpenClawTranslator:
         )
     
     def parse_json(self, content: str) -> SDFAISkill:
-        data = json.loads(content)
+        return self._skill_from_json(_json_loads(content))
+    
+    def _skill_from_json(self, data: Dict) -> SDFAISkill:
         return SDFAISkill(
             name=data.get("name", "Unknown"),
             version=data.get("version", "1.0.0"),
@@ -184,16 +216,20 @@ class OpenClawTranslator:
         )
     
     def translate(self, content: str) -> SDFAISkill:
-        fmt = self.detect_format(content)
+        return self.translate_with_format(content)[1]
+    
+    def translate_with_format(self, content: str) -> Tuple[str, SDFAISkill]:
+        """只识别一次格式，同时返回格式和翻译结果"""
+        fmt, data = self._detect(content)
         
         if fmt == 'openclaw':
-            return self.parse_openclaw(content)
+            return fmt, self.parse_openclaw(content)
         elif fmt == 'nanobot':
-            return self.parse_nanobot(content)
+            return fmt, self.parse_nanobot(content)
         elif fmt == 'json':
-            return self.parse_json(content)
+            return fmt, self._skill_from_json(data)
         else:
-            return SDFAISkill(
+            return fmt, SDFAISkill(
                 name="Raw Skill",
                 version="1.0.0",
                 description=content[:200],
@@ -209,14 +245,14 @@ class OpenClawTranslator:
         content = source_path.read_text(encoding='utf-8')
         skill = self.translate(content)
         
-        skill_dir = self.installed_dir / skill.name.lower().replace(' ', '_')
+        skill_dir = self.installed_dir / skill.name_key
         skill_dir.mkdir(exist_ok=True)
         
         skill_file = skill_dir / "SKILL.md"
-        skill_file.write_text(skill.to_markdown(), encoding='utf-8')
+        skill_file.write_bytes(skill.to_markdown().encode('utf-8'))
         
         json_file = skill_dir / "skill.json"
-        json_file.write_text(json.dumps(skill.to_json(), ensure_ascii=False, indent=2), encoding='utf-8')
+        json_file.write_bytes(_json_dump_bytes(skill.to_json()))
         
         return skill
     
@@ -227,8 +263,8 @@ class OpenClawTranslator:
                 json_file = skill_dir / "skill.json"
                 if json_file.exists():
                     try:
-                        data = json.loads(json_file.read_text(encoding='utf-8'))
+                        data = _json_loads(json_file.read_bytes())
                         skills.append(data)
-                    except:
+                    except (OSError, ValueError):
                         pass
         return skills
@@ -5,17 +5,22 @@ SDFAI Skill Watcher - 技能文件监控器
 import asyncio
 import json
 import hashlib
+import itertools
+import os
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional, Callable, Set
+from typing import TYPE_CHECKING, Dict, List, Optional, Callable, Tuple
 from datetime import datetime
 from dataclasses import dataclass, field
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileSystemEvent
 
 from .skill_translator import OpenClawTranslator, SDFAISkill
 
+if TYPE_CHECKING:
+    from watchdog.events import FileSystemEvent
+    from watchdog.observers import Observer
 
-@dataclass
+
+@dataclass(slots=True)
 class PendingSkill:
     path: Path
     detected_at: datetime
@@ -26,31 +31,83 @@ class PendingSkill:
     hash: str = ""
 
 
-class SkillFileHandler(FileSystemEventHandler):
+PARSE_CACHE_SIZE = 256
+SKILL_SUFFIXES = ('.md', '.json')
+DEBOUNCE_DELAY = 0.25
+MAX_PENDING_SKILLS = 1024
+
+
+def _read_and_hash(path: Path) -> Tuple[bytes, str]:
+    """一次读取，内容同时用于摘要和解析"""
+    raw = path.read_bytes()
+    return raw, hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class SkillFileHandler:
+    """watchdog事件处理器，按dispatch协议实现，无需在导入时加载watchdog"""
+    
     def __init__(self, watcher: 'SkillWatcher'):
         self.watcher = watcher
-        self.processed_hashes: Set[str] = set()
+        self._stat_cache: Dict[Path, Tuple[int, int]] = {}
+        self._pending_timers: Dict[Path, asyncio.TimerHandle] = {}
+    
+    def dispatch(self, event: 'FileSystemEvent'):
+        # 只关心新建和修改，moved/deleted事件有意丢弃
+        if event.event_type == 'created':
+            self.on_created(event)
+        elif event.event_type == 'modified':
+            self.on_modified(event)
     
-    def on_created(self, event: FileSystemEvent):
+    def on_created(self, event: 'FileSystemEvent'):
         if event.is_directory:
             return
         
         path = Path(event.src_path)
         if self._is_skill_file(path):
-            asyncio.create_task(self.watcher.on_skill_detected(path))
+            self._schedule(path)
     
-    def on_modified(self, event: FileSystemEvent):
+    def on_modified(self, event: 'FileSystemEvent'):
         if event.is_directory:
             return
         
         path = Path(event.src_path)
         if self._is_skill_file(path):
-            file_hash = self._get_file_hash(path)
-            if file_hash not in self.processed_hashes:
-                asyncio.create_task(self.watcher.on_skill_detected(path))
+            # 大小和修改时间未变时直接跳过，内容去重交给on_skill_detected的解析缓存
+            try:
+                st = path.stat()
+            except OSError:
+                return
+            signature = (st.st_size, st.st_mtime_ns)
+            if self._stat_cache.get(path) == signature:
+                return
+            self._stat_cache[path] = signature
+            self._schedule(path)
+    
+    def _schedule(self, path: Path):
+        """watchdog线程回调，转交事件循环线程做防抖"""
+        loop = self.watcher.loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._debounce, path)
+    
+    def _debounce(self, path: Path):
+        # 同一文件在窗口期内的连续事件只处理最后一次
+        prev = self._pending_timers.pop(path, None)
+        if prev:
+            prev.cancel()
+        self._pending_timers[path] = self.watcher.loop.call_later(DEBOUNCE_DELAY, self._fire, path)
+    
+    def _fire(self, path: Path):
+        self._pending_timers.pop(path, None)
+        asyncio.create_task(self.watcher.on_skill_detected(path))
+    
+    def cancel_pending(self):
+        for timer in self._pending_timers.values():
+            timer.cancel()
+        self._pending_timers.clear()
     
     def _is_skill_file(self, path: Path) -> bool:
-        if path.suffix not in ['.md', '.json']:
+        if path.suffix not in SKILL_SUFFIXES:
             return False
         
         if path.name.startswith('.'):
@@ -60,13 +117,6 @@ class SkillFileHandler(FileSystemEventHandler):
             return False
         
         return True
-    
-    def _get_file_hash(self, path: Path) -> str:
-        try:
-            content = path.read_bytes()
-            return hashlib.md5(content).hexdigest()
-        except:
-            return ""
 
 
 class SkillWatcher:
@@ -83,17 +133,27 @@ class SkillWatcher:
         self.incoming_dir = skills_dir / "incoming"
         self.incoming_dir.mkdir(parents=True, exist_ok=True)
         
-        self.pending_skills: Dict[str, PendingSkill] = {}
-        self.observer: Optional[Observer] = None
+        # 按检测顺序保存，超出上限时淘汰最早未处理的条目
+        self.pending_skills: 'OrderedDict[str, PendingSkill]' = OrderedDict()
+        self._pending_counter = itertools.count()
+        self.observer: Optional['Observer'] = None
+        self._handler: Optional[SkillFileHandler] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         self._running = False
+        # (路径, 内容摘要) -> (格式, 技能)，内容未变时跳过整个解析流程
+        self._parse_cache: 'OrderedDict[Tuple[Path, str], Tuple[str, Optional[SDFAISkill]]]' = OrderedDict()
     
     def start(self):
         if self._running:
             return
         
-        handler = SkillFileHandler(self)
+        # 延迟到启动时再加载watchdog，缩短模块导入时间
+        from watchdog.observers import Observer
+        
+        self.loop = asyncio.get_event_loop()
+        self._handler = SkillFileHandler(self)
         self.observer = Observer()
-        self.observer.schedule(handler, str(self.incoming_dir), recursive=True)
+        self.observer.schedule(self._handler, str(self.incoming_dir), recursive=True)
         self.observer.start()
         self._running = True
         
@@ -103,39 +163,75 @@ class SkillWatcher:
         if self.observer:
             self.observer.stop()
             self.observer.join()
+        if self._handler:
+            self._handler.cancel_pending()
         self._running = False
     
     def _scan_existing_files(self):
-        for path in self.incoming_dir.rglob("*"):
-            if path.is_file() and path.suffix in ['.md', '.json']:
-                asyncio.create_task(self.on_skill_detected(path))
+        for path in self._walk_skill_files(self.incoming_dir):
+            asyncio.create_task(self.on_skill_detected(Path(path)))
+    
+    def _walk_skill_files(self, directory):
+        """基于os.scandir递归遍历，仅为技能文件构造Path"""
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from self._walk_skill_files(entry.path)
+            elif entry.name.endswith(SKILL_SUFFIXES) and not entry.name.startswith('.') and entry.is_file():
+                yield entry.path
     
     async def on_skill_detected(self, path: Path):
         try:
-            content = path.read_text(encoding='utf-8')
-            fmt = self.translator.detect_format(content)
+            # 读文件、摘要和解析都在线程池中执行，事件循环只负责缓存和通知
+            raw, file_hash = await asyncio.to_thread(_read_and_hash, path)
             
-            if fmt == 'sdfai' and '## Triggers' not in content:
-                return
+            key = (path, file_hash)
+            cached = self._parse_cache.get(key)
+            if cached is not None:
+                self._parse_cache.move_to_end(key)
+                # 内容未变且仍在等待确认，不重复通知用户
+                if any(p.hash == file_hash for p in self.pending_skills.values()):
+                    return
+            else:
+                cached = await asyncio.to_thread(self._parse_content, raw)
+                self._parse_cache[key] = cached
+                if len(self._parse_cache) > PARSE_CACHE_SIZE:
+                    self._parse_cache.popitem(last=False)
             
-            skill = self.translator.translate(content)
+            fmt, skill = cached
+            if skill is None:
+                return
             
             pending = PendingSkill(
                 path=path,
                 detected_at=datetime.now(),
                 format=fmt,
                 skill_name=skill.name,
-                hash=self._get_file_hash(path)
+                hash=file_hash
             )
             
-            pending_id = f"{skill.name}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            pending_id = f"{next(self._pending_counter):08x}_{file_hash[:8]}"
             self.pending_skills[pending_id] = pending
+            if len(self.pending_skills) > MAX_PENDING_SKILLS:
+                self.pending_skills.popitem(last=False)
             
             await self._notify_user(pending_id, pending)
             
         except Exception as e:
             print(f"Error detecting skill: {e}")
     
+    def _parse_content(self, raw: bytes) -> Tuple[str, Optional[SDFAISkill]]:
+        content = raw.decode('utf-8')
+        # 先识别格式，非技能的普通markdown无需翻译
+        if '## Triggers' not in content:
+            fmt = self.translator.detect_format(content)
+            if fmt == 'sdfai':
+                return fmt, None
+        return self.translator.translate_with_format(content)
+    
     async def _notify_user(self, pending_id: str, pending: PendingSkill):
         if self.im_notifier:
             message = self._format_confirmation_message(pending_id, pending)
@@ -191,13 +287,6 @@ class SkillWatcher:
         del self.pending_skills[pending_id]
         return True
     
-    def _get_file_hash(self, path: Path) -> str:
-        try:
-            content = path.read_bytes()
-            return hashlib.md5(content).hexdigest()
-        except:
-            return ""
-    
     def get_pending_skills(self) -> List[Dict]:
         return [
             {
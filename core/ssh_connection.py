@@ -3,18 +3,27 @@ SSH Connection - SSH连接实现
 使用asyncssh实现SSH连接
 """
 import asyncio
+import shlex
+import time
+import uuid
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Any, Callable, AsyncIterator
 from datetime import datetime
 
-try:
-    import asyncssh
-except ImportError:
-    asyncssh = None
-
 from .connection_manager import Connection, ConnectionInfo, ConnectionState, ConnectionType
 
 
+@lru_cache(maxsize=None)
+def _get_asyncssh():
+    """首次连接时才加载asyncssh（依赖cryptography，导入开销较大）"""
+    try:
+        import asyncssh
+    except ImportError:
+        return None
+    return asyncssh
+
+
 class SSHConnectionInfo(ConnectionInfo):
     def __init__(
         self,
@@ -47,9 +56,15 @@ class SSHConnection(Connection):
         self._reader = None
         self._keepalive_interval = 30
         self._idle_timeout = 3600
-        self._last_activity = datetime.now()
+        self._read_chunk_size = 4096
+        # execute复用的常驻shell通道，命令之间以哨兵行分隔
+        self._exec_proc = None
+        self._exec_lock = asyncio.Lock()
+        self._exec_sentinel = f"__SDFAI_EOF_{uuid.uuid4().hex}__"
+        self._last_activity = time.monotonic()
     
     async def connect(self) -> bool:
+        asyncssh = _get_asyncssh()
         if not asyncssh:
             self._state = ConnectionState.ERROR
             await self._notify_error("asyncssh not installed")
@@ -72,7 +87,7 @@ class SSHConnection(Connection):
             
             self._state = ConnectionState.CONNECTED
             self.info.connected_at = datetime.now()
-            self._last_activity = datetime.now()
+            self._last_activity = time.monotonic()
             
             await self._notify_connect()
             return True
@@ -84,11 +99,13 @@ class SSHConnection(Connection):
             return False
     
     async def disconnect(self) -> bool:
+        self._close_exec_proc()
+        
         if self._connection:
             try:
                 self._connection.close()
                 await self._connection.wait_closed()
-            except:
+            except Exception:
                 pass
         
         self._connection = None
@@ -107,38 +124,71 @@ class SSHConnection(Connection):
             if self._writer:
                 self._writer.write(f"{data}\n")
                 await self._writer.drain()
-                self._last_activity = datetime.now()
+                self._last_activity = time.monotonic()
                 return True
             return False
-        except:
+        except Exception:
             return False
     
     async def receive(self) -> AsyncIterator[str]:
+        """逐块产出原始输出，每块最多_read_chunk_size(4096)个字符；块边界与行无关，可能截断在行中间，按行处理的调用方需自行缓冲拆分"""
         if not self.is_connected or not self._reader:
             return
         
         try:
-            async for line in self._reader:
-                self._last_activity = datetime.now()
-                yield line
-        except:
+            while True:
+                chunk = await self._reader.read(self._read_chunk_size)
+                if not chunk:
+                    break
+                self._last_activity = time.monotonic()
+                yield chunk
+        except Exception:
             pass
     
     async def execute(self, command: str, timeout: int = 30) -> str:
         if not self.is_connected:
             return "Not connected"
         
-        try:
-            result = await asyncio.wait_for(
-                self._connection.run(command, check=False),
-                timeout=timeout
-            )
-            self._last_activity = datetime.now()
-            return result.stdout
-        except asyncio.TimeoutError:
-            return f"Command timed out after {timeout}s"
-        except Exception as e:
-            return f"Error: {e}"
+        async with self._exec_lock:
+            try:
+                output = await asyncio.wait_for(
+                    self._run_in_exec_proc(command),
+                    timeout=timeout
+                )
+                self._last_activity = time.monotonic()
+                return output
+            except asyncio.CancelledError:
+                # 取消时命令输出可能读了一半，通道已不同步，必须丢弃
+                self._close_exec_proc()
+                raise
+            except asyncio.TimeoutError:
+                # 超时命令仍占用shell，丢弃通道，下次重新创建
+                self._close_exec_proc()
+                return f"Command timed out after {timeout}s"
+            except Exception as e:
+                self._close_exec_proc()
+                return f"Error: {e}"
+    
+    async def _run_in_exec_proc(self, command: str) -> str:
+        if self._exec_proc is None:
+            self._exec_proc = await self._connection.create_process(encoding='utf-8')
+            self._exec_proc.stdin.write("exec 2>/dev/null\n")
+        
+        # 每条命令在独立的 sh -c 中执行：exit、语法错误和 cd 都不会影响共享shell及分隔符
+        sentinel = self._exec_sentinel
+        self._exec_proc.stdin.write(
+            f"sh -c {shlex.quote(command)} </dev/null; printf '%s\\n' '{sentinel}'\n"
+        )
+        output = await self._exec_proc.stdout.readuntil(f"{sentinel}\n")
+        return output[:-len(sentinel) - 1]
+    
+    def _close_exec_proc(self):
+        if self._exec_proc is not None:
+            try:
+                self._exec_proc.close()
+            except Exception:
+                pass
+            self._exec_proc = None
     
     async def open_session(self) -> tuple:
         if not self.is_connected:
@@ -149,16 +199,16 @@ class SSHConnection(Connection):
                 term_type='xterm',
                 encoding='utf-8'
             )
-            self._last_activity = datetime.now()
+            self._last_activity = time.monotonic()
             return self._writer, self._reader
-        except:
+        except Exception:
             return None, None
     
     async def close_session(self) -> bool:
         if self._writer:
             try:
                 self._writer.close()
-            except:
+            except Exception:
                 pass
         
         self._writer = None
@@ -167,7 +217,7 @@ class SSHConnection(Connection):
     
     @property
     def idle_seconds(self) -> float:
-        return (datetime.now() - self._last_activity).total_seconds()
+        return time.monotonic() - self._last_activity
     
     def update_activity(self):
-        self._last_activity = datetime.now()
+        self._last_activity = time.monotonic()
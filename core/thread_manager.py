@@ -3,34 +3,118 @@ Thread Manager - 线程管理器
 管理异步任务和线程池
 """
 import asyncio
+import itertools
+import logging
+import os
 import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Callable, Coroutine
+from typing import List, Optional, Any, Callable, Coroutine, Iterator, Set
 from dataclasses import dataclass, field
 from datetime import datetime
+from enum import IntEnum
 from concurrent.futures import ThreadPoolExecutor
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+
+TASK_SHARDS = 16
+NS_PER_HOUR = 3600 * 10**9
+STATE_WRITE_BUFFER = 256 * 1024
+AUTOSAVE_INTERVAL = 5.0
+SHUTDOWN_BATCH_SIZE = 256
+
+
+if orjson:
+    _json_loads = orjson.loads
+    
+    def _json_dump_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+else:
+    _json_loads = json.loads
+    
+    def _json_dump_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+_task_id_prefix_cache = threading.local()
+
+
+def _task_id_prefix() -> str:
+    """同一秒内复用格式化好的时间前缀，按线程缓存无需加锁"""
+    second = int(time.time())
+    cache = _task_id_prefix_cache
+    if getattr(cache, 'second', None) != second:
+        cache.second = second
+        cache.prefix = time.strftime('%Y%m%d%H%M%S', time.localtime(second))
+    return cache.prefix
+
+
+def _ns_to_datetime(ns: Optional[int]) -> Optional[datetime]:
+    return datetime.fromtimestamp(ns / 1e9) if ns else None
+
+
+def _ns_to_iso(ns: Optional[int]) -> Optional[str]:
+    return datetime.fromtimestamp(ns / 1e9).isoformat() if ns else None
+
+
+def _iso_to_ns(value: Optional[str]) -> Optional[int]:
+    return int(datetime.fromisoformat(value).timestamp() * 10**9) if value else None
+
+
+class TaskStatus(IntEnum):
+    PENDING = 0
+    RUNNING = 1
+    COMPLETED = 2
+    FAILED = 3
+    CANCELLED = 4
+
+
+# 热路径上的状态切换直接引用模块级常量，省去每次的枚举类属性查找
+_PENDING, _RUNNING, _COMPLETED, _FAILED, _CANCELLED = TaskStatus
+
+
+@dataclass(slots=True)
 class TaskInfo:
     task_id: str
     name: str
-    status: str
-    created_at: datetime
-    started_at: Optional[datetime] = None
-    completed_at: Optional[datetime] = None
+    status: TaskStatus
+    # 时间戳以整数纳秒保存，仅在序列化时转换为datetime
+    created_at_ns: Optional[int] = field(default_factory=time.time_ns)
+    started_at_ns: Optional[int] = None
+    completed_at_ns: Optional[int] = None
     error: Optional[str] = None
     result: Any = None
+    # 原始异常对象，wait_for_task在任务结束后按原类型重新抛出；不参与序列化
+    exception: Optional[BaseException] = None
+    
+    @property
+    def created_at(self) -> Optional[datetime]:
+        return _ns_to_datetime(self.created_at_ns)
+    
+    @property
+    def started_at(self) -> Optional[datetime]:
+        return _ns_to_datetime(self.started_at_ns)
+    
+    @property
+    def completed_at(self) -> Optional[datetime]:
+        return _ns_to_datetime(self.completed_at_ns)
     
     def to_dict(self) -> dict:
         return {
             "task_id": self.task_id,
             "name": self.name,
-            "status": self.status,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "started_at": self.started_at.isoformat() if self.started_at else None,
-            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "status": self.status.name.lower(),
+            "created_at": _ns_to_iso(self.created_at_ns),
+            "started_at": _ns_to_iso(self.started_at_ns),
+            "completed_at": _ns_to_iso(self.completed_at_ns),
             "error": self.error
         }
 
@@ -42,89 +126,108 @@ class ThreadManager:
         self.max_workers = max_workers
         
         self._executor = ThreadPoolExecutor(max_workers=max_workers)
-        self._tasks: Dict[str, asyncio.Task] = {}
-        self._task_info: Dict[str, TaskInfo] = {}
-        self._lock = threading.Lock()
-        self._task_counter = 0
+        # 按task_id分片，每片(锁, 任务, 任务信息)，写操作只锁所在分片；单键读取依赖GIL无需加锁
+        self._shards = [
+            (threading.Lock(), {}, {}) for _ in range(TASK_SHARDS)
+        ]
+        self._task_counter = itertools.count(1)
+        # 按完成先后排列的(完成时间ns, task_id)，清理时只需从队首弹出过期项
+        self._completed: deque = deque()
+        self._cleanup_lock = threading.Lock()
+        # 未结束任务的id，get_active_tasks只需遍历这部分
+        self._active: Set[str] = set()
+        # 状态变化只置脏标记，由自动保存协程按间隔合并写盘
+        self._dirty = False
+        self._save_lock = threading.Lock()
+        self._autosave_task: Optional[asyncio.Task] = None
+    
+    def _shard(self, task_id: str):
+        return self._shards[hash(task_id) & (TASK_SHARDS - 1)]
+    
+    def _all_task_info(self) -> List[TaskInfo]:
+        result = []
+        for lock, _, task_info in self._shards:
+            with lock:
+                result.extend(task_info.values())
+        return result
+    
+    def _all_tasks(self) -> List[asyncio.Task]:
+        result = []
+        for lock, tasks, _ in self._shards:
+            with lock:
+                result.extend(tasks.values())
+        return result
+    
+    def _record_completion(self, info: TaskInfo):
+        # 取消路径可能由_run_task和done回调各记一次，只保留第一次
+        if info.completed_at_ns is not None:
+            return
+        info.completed_at_ns = time.time_ns()
+        self._completed.append((info.completed_at_ns, info.task_id))
+        self._active.discard(info.task_id)
+        self._dirty = True
     
     def generate_task_id(self) -> str:
-        with self._lock:
-            self._task_counter += 1
-            return f"task_{datetime.now().strftime('%Y%m%d%H%M%S')}_{self._task_counter}"
+        return f"task_{_task_id_prefix()}_{next(self._task_counter)}"
     
     async def submit_async(
         self, 
         coro: Coroutine, 
         name: str = "",
-        callback: Callable = None
+        callback: Callable = None,
+        retain_result: bool = True
     ) -> str:
         task_id = self.generate_task_id()
+        if not name:
+            name = getattr(coro, '__name__', "unknown")
         
         info = TaskInfo(
             task_id=task_id,
-            name=name or coro.__name__ if hasattr(coro, '__name__') else "unknown",
-            status="pending",
-            created_at=datetime.now()
+            name=name,
+            status=_PENDING
         )
-        self._task_info[task_id] = info
+        lock, tasks, task_info = self._shard(task_id)
+        with lock:
+            task_info[task_id] = info
+        self._active.add(task_id)
+        self._dirty = True
         
-        async def wrapped_task():
-            info.status = "running"
-            info.started_at = datetime.now()
-            
-            try:
-                result = await coro
-                info.status = "completed"
-                info.result = result
-                info.completed_at = datetime.now()
-                
-                if callback:
-                    await self._run_callback(callback, result, None)
-                
-                return result
-            except Exception as e:
-                info.status = "failed"
-                info.error = str(e)
-                info.completed_at = datetime.now()
-                
-                if callback:
-                    await self._run_callback(callback, None, e)
-                
-                raise
-        
-        task = asyncio.create_task(wrapped_task())
-        self._tasks[task_id] = task
+        callback_is_coro = asyncio.iscoroutinefunction(callback) if callback else False
+        task = asyncio.create_task(
+            self._run_task(coro, info, callback, callback_is_coro, retain_result)
+        )
+        with lock:
+            tasks[task_id] = task
+        # 任务结束即释放Task引用，状态和结果保留在TaskInfo中
+        task.add_done_callback(lambda t, i=info: self._on_task_done(t, i))
         
         return task_id
     
-    def submit_sync(self, func: Callable, *args, name: str = "", callback: Callable = None, **kwargs) -> str:
+    def submit_sync(
+        self,
+        func: Callable,
+        *args,
+        name: str = "",
+        callback: Callable = None,
+        retain_result: bool = True,
+        **kwargs
+    ) -> str:
         task_id = self.generate_task_id()
+        if not name:
+            name = getattr(func, '__name__', "unknown")
         
         info = TaskInfo(
             task_id=task_id,
-            name=name or func.__name__,
-            status="pending",
-            created_at=datetime.now()
+            name=name,
+            status=_PENDING
         )
-        self._task_info[task_id] = info
+        lock, _, task_info = self._shard(task_id)
+        with lock:
+            task_info[task_id] = info
+        self._active.add(task_id)
+        self._dirty = True
         
-        def wrapped_func():
-            info.status = "running"
-            info.started_at = datetime.now()
-            
-            try:
-                result = func(*args, **kwargs)
-                info.status = "completed"
-                info.result = result
-                info.completed_at = datetime.now()
-                return result
-            except Exception as e:
-                info.status = "failed"
-                info.error = str(e)
-                info.completed_at = datetime.now()
-                raise
-        
-        future = self._executor.submit(wrapped_func)
+        future = self._executor.submit(self._run_func, func, args, kwargs, info, retain_result)
         
         if callback:
             future.add_done_callback(
@@ -133,14 +236,81 @@ class ThreadManager:
         
         return task_id
     
-    async def _run_callback(self, callback: Callable, result: Any, error: Exception):
+    # 任务包装逻辑放在方法中并显式传参，避免每次提交都创建新的闭包
+    async def _run_task(
+        self,
+        coro: Coroutine,
+        info: TaskInfo,
+        callback: Optional[Callable],
+        callback_is_coro: bool,
+        retain_result: bool
+    ) -> Any:
+        info.status = _RUNNING
+        info.started_at_ns = time.time_ns()
+        self._dirty = True
+        
         try:
-            if asyncio.iscoroutinefunction(callback):
+            result = await coro
+            info.status = _COMPLETED
+            if retain_result:
+                info.result = result
+            self._record_completion(info)
+            
+            if callback:
+                await self._run_callback(callback, callback_is_coro, result, None)
+            
+            return result
+        except asyncio.CancelledError:
+            info.status = _CANCELLED
+            self._record_completion(info)
+            raise
+        except Exception as e:
+            info.status = _FAILED
+            info.error = str(e)
+            info.exception = e
+            self._record_completion(info)
+            
+            if callback:
+                await self._run_callback(callback, callback_is_coro, None, e)
+            
+            raise
+    
+    def _run_func(self, func: Callable, args: tuple, kwargs: dict, info: TaskInfo, retain_result: bool) -> Any:
+        info.status = _RUNNING
+        info.started_at_ns = time.time_ns()
+        self._dirty = True
+        
+        try:
+            result = func(*args, **kwargs)
+            info.status = _COMPLETED
+            if retain_result:
+                info.result = result
+            self._record_completion(info)
+            return result
+        except Exception as e:
+            info.status = _FAILED
+            info.error = str(e)
+            info.exception = e
+            self._record_completion(info)
+            raise
+    
+    def _on_task_done(self, task: asyncio.Task, info: TaskInfo):
+        lock, tasks, _ = self._shard(info.task_id)
+        with lock:
+            tasks.pop(info.task_id, None)
+        # 在_run_task开始执行前就被取消的任务不会经过其异常分支，在此补记完成
+        if task.cancelled() and info.completed_at_ns is None:
+            info.status = _CANCELLED
+            self._record_completion(info)
+    
+    async def _run_callback(self, callback: Callable, is_coro: bool, result: Any, error: Exception):
+        try:
+            if is_coro:
                 await callback(result, error)
             else:
                 callback(result, error)
         except Exception as e:
-            pass
+            logger.warning(f"Task callback failed: {e}")
     
     def _sync_callback_wrapper(self, future, callback):
         try:
@@ -150,50 +320,87 @@ class ThreadManager:
             callback(None, e)
     
     def get_task_status(self, task_id: str) -> Optional[TaskInfo]:
-        return self._task_info.get(task_id)
+        return self._shard(task_id)[2].get(task_id)
     
     def cancel_task(self, task_id: str) -> bool:
-        if task_id in self._tasks:
-            task = self._tasks[task_id]
-            if not task.done():
-                task.cancel()
-                if task_id in self._task_info:
-                    self._task_info[task_id].status = "cancelled"
-                return True
-        return False
+        task = self._shard(task_id)[1].get(task_id)
+        if task is None or task.done():
+            return False
+        
+        # asyncio.Task只能在其所属事件循环线程中取消，其他线程需转交
+        loop = task.get_loop()
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        
+        if running_loop is loop:
+            self._cancel_on_loop(task_id, task)
+        else:
+            loop.call_soon_threadsafe(self._cancel_on_loop, task_id, task)
+        return True
+    
+    def _cancel_on_loop(self, task_id: str, task: asyncio.Task):
+        if task.cancel():
+            lock, _, task_info = self._shard(task_id)
+            with lock:
+                if task_id in task_info:
+                    task_info[task_id].status = _CANCELLED
+            self._active.discard(task_id)
+            self._dirty = True
     
     def get_all_tasks(self) -> List[TaskInfo]:
-        return list(self._task_info.values())
+        return self._all_task_info()
+    
+    def iter_tasks(self) -> Iterator[TaskInfo]:
+        """不复制快照直接遍历全部任务，遍历期间不能有提交或清理操作"""
+        for _, _, task_info in self._shards:
+            yield from task_info.values()
     
     def get_active_tasks(self) -> List[TaskInfo]:
-        return [
-            info for info in self._task_info.values()
-            if info.status in ["pending", "running"]
-        ]
+        active = []
+        for task_id in list(self._active):
+            info = self._shard(task_id)[2].get(task_id)
+            if info is not None and info.status <= _RUNNING:
+                active.append(info)
+        return active
     
     def cleanup_completed(self, max_age_hours: int = 24) -> int:
-        cutoff = datetime.now()
-        to_remove = []
-        
-        for task_id, info in self._task_info.items():
-            if info.status in ["completed", "failed", "cancelled"]:
-                if info.completed_at:
-                    age_hours = (cutoff - info.completed_at).total_seconds() / 3600
-                    if age_hours > max_age_hours:
-                        to_remove.append(task_id)
+        cutoff_ns = time.time_ns() - int(max_age_hours * NS_PER_HOUR)
+        removed = 0
         
-        for task_id in to_remove:
-            del self._task_info[task_id]
-            if task_id in self._tasks:
-                del self._tasks[task_id]
+        with self._cleanup_lock:
+            completed = self._completed
+            while completed and completed[0][0] < cutoff_ns:
+                task_id = completed.popleft()[1]
+                lock, tasks, task_info = self._shard(task_id)
+                with lock:
+                    info = task_info.get(task_id)
+                    if info is not None and info.status >= _COMPLETED:
+                        del task_info[task_id]
+                        tasks.pop(task_id, None)
+                        removed += 1
         
-        return len(to_remove)
+        if removed:
+            self._dirty = True
+        return removed
     
     async def wait_for_task(self, task_id: str, timeout: float = None) -> Any:
-        if task_id not in self._tasks:
-            raise ValueError(f"Task {task_id} not found")
-        
-        task = self._tasks[task_id]
+        _, tasks, task_info = self._shard(task_id)
+        task = tasks.get(task_id)
+        if task is None:
+            # 已结束的任务不再持有Task对象，直接按TaskInfo返回
+            info = task_info.get(task_id)
+            if info is None or info.status <= _RUNNING:
+                raise ValueError(f"Task {task_id} not found")
+            if info.status == _FAILED:
+                # 从状态文件恢复的任务只有错误文本
+                if info.exception is not None:
+                    raise info.exception
+                raise RuntimeError(info.error)
+            if info.status == _CANCELLED:
+                raise asyncio.CancelledError()
+            return info.result
         
         if timeout:
             return await asyncio.wait_for(task, timeout=timeout)
@@ -201,41 +408,96 @@ class ThreadManager:
             return await task
     
     async def shutdown(self, wait: bool = True):
-        for task_id, task in self._tasks.items():
+        autosave_task, self._autosave_task = self._autosave_task, None
+        if autosave_task:
+            autosave_task.cancel()
+            await asyncio.gather(autosave_task, return_exceptions=True)
+        
+        all_tasks = self._all_tasks()
+        for task in all_tasks:
             if not task.done():
                 task.cancel()
         
         if wait:
-            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            # 分批等待，避免一次性为全部任务创建聚合Future和回调
+            for start in range(0, len(all_tasks), SHUTDOWN_BATCH_SIZE):
+                await asyncio.gather(
+                    *all_tasks[start:start + SHUTDOWN_BATCH_SIZE], return_exceptions=True
+                )
+        
+        if autosave_task and self._dirty:
+            self.save_state()
         
         self._executor.shutdown(wait=wait)
     
+    def start_autosave(self, interval: float = AUTOSAVE_INTERVAL):
+        if self._autosave_task is None or self._autosave_task.done():
+            self._autosave_task = asyncio.create_task(self._autosave_loop(interval))
+    
+    async def _autosave_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            if self._dirty:
+                try:
+                    await self.save_state_async()
+                except OSError as e:
+                    logger.error(f"Failed to save thread state: {e}")
+    
+    async def save_state_async(self):
+        await asyncio.wrap_future(self._executor.submit(self.save_state))
+    
     def save_state(self):
+        with self._save_lock:
+            # 写盘前清除标记，写入期间的新变化会重新置脏；写入失败则恢复以便下次重试
+            self._dirty = False
+            try:
+                self._save_state_impl()
+            except BaseException:
+                self._dirty = True
+                raise
+    
+    def _save_state_impl(self):
         state_file = self.data_dir / "thread_state.json"
-        state = {
-            "updated_at": datetime.now().isoformat(),
-            "tasks": [info.to_dict() for info in self._task_info.values()]
-        }
-        state_file.write_text(
-            json.dumps(state, ensure_ascii=False, indent=2),
-            encoding='utf-8'
-        )
+        # 先写临时文件再原子替换，进程中途被杀也不会留下半个文件
+        tmp_file = state_file.with_suffix('.json.tmp')
+        # 逐个任务序列化写入，不在内存中构造完整的任务字典列表
+        with open(tmp_file, 'wb', buffering=STATE_WRITE_BUFFER) as f:
+            f.write(b'{"updated_at": ' + _json_dump_bytes(datetime.now().isoformat()) + b', "tasks": [')
+            separator = b'\n  '
+            for info in self._all_task_info():
+                f.write(separator)
+                f.write(_json_dump_bytes(info.to_dict()))
+                separator = b',\n  '
+            f.write(b'\n]}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, state_file)
     
     def load_state(self):
         state_file = self.data_dir / "thread_state.json"
         if state_file.exists():
             try:
-                state = json.loads(state_file.read_text(encoding='utf-8'))
+                state = _json_loads(state_file.read_bytes())
+                loaded_completions = []
                 for task_data in state.get("tasks", []):
                     info = TaskInfo(
                         task_id=task_data["task_id"],
                         name=task_data["name"],
-                        status=task_data["status"],
-                        created_at=datetime.fromisoformat(task_data["created_at"]) if task_data.get("created_at") else None,
-                        started_at=datetime.fromisoformat(task_data["started_at"]) if task_data.get("started_at") else None,
-                        completed_at=datetime.fromisoformat(task_data["completed_at"]) if task_data.get("completed_at") else None,
+                        status=TaskStatus[task_data["status"].upper()],
+                        created_at_ns=_iso_to_ns(task_data.get("created_at")),
+                        started_at_ns=_iso_to_ns(task_data.get("started_at")),
+                        completed_at_ns=_iso_to_ns(task_data.get("completed_at")),
                         error=task_data.get("error")
                     )
-                    self._task_info[info.task_id] = info
-            except:
-                pass
+                    lock, _, task_info = self._shard(info.task_id)
+                    with lock:
+                        task_info[info.task_id] = info
+                    if info.status <= _RUNNING:
+                        self._active.add(info.task_id)
+                    if info.completed_at_ns:
+                        loaded_completions.append((info.completed_at_ns, info.task_id))
+                
+                with self._cleanup_lock:
+                    self._completed = deque(sorted(itertools.chain(self._completed, loaded_completions)))
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.error(f"Failed to load thread state: {e}")
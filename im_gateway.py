@@ -4,32 +4,49 @@ Unified IM Gateway for SDFAI
 Based on nanobot implementations - no public IP required
 
 Supported platforms:
-- Feishu (飞书) - WebSocket via lark-oapi SDK (multiprocessing)
+- Feishu (飞书) - WebSocket via lark-oapi SDK (in-process)
 - DingTalk (钉钉) - Stream Mode via dingtalk-stream SDK
 - QQ - WebSocket via qq-botpy SDK
 """
 import asyncio
+import importlib.util
 import json
 import logging
-import subprocess
-import sys
+import random
+import threading
 import time
-import os
-from collections import OrderedDict
+from collections import deque
 from typing import Any, Optional, Callable, Dict
 from dataclasses import dataclass
 from enum import Enum
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+if orjson:
+    _json_loads = orjson.loads
+    
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+else:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+
 class IMPlatform(Enum):
     FEISHU = "feishu"
     DINGTALK = "dingtalk"
     QQ = "qq"
 
 
-@dataclass
+@dataclass(slots=True)
 class IMMessage:
     platform: IMPlatform
     sender_id: str
@@ -47,12 +64,17 @@ class BaseIMChannel:
     """Base class for IM channels"""
     
     name = "base"
+    processed_capacity = 1000
+    # Reconnect backoff: 2**attempts + jitter seconds, capped; reset after a stable session
+    reconnect_max_delay = 60.0
+    stable_uptime = 60.0
     
     def __init__(self, config: dict, message_handler: Callable):
         self.config = config
         self.message_handler = message_handler
         self._running = False
-        self._processed_ids = OrderedDict()
+        self._processed_seen: set = set()
+        self._processed_order: deque = deque(maxlen=self.processed_capacity)
     
     async def start(self) -> bool:
         raise NotImplementedError
@@ -64,16 +86,41 @@ class BaseIMChannel:
         raise NotImplementedError
     
     def _is_processed(self, msg_id: str) -> bool:
-        if msg_id in self._processed_ids:
+        seen = self._processed_seen
+        if msg_id in seen:
             return True
-        self._processed_ids[msg_id] = None
-        while len(self._processed_ids) > 1000:
-            self._processed_ids.popitem(last=False)
+        order = self._processed_order
+        if len(order) == order.maxlen:
+            seen.discard(order[0])
+        order.append(msg_id)
+        seen.add(msg_id)
         return False
+    
+    async def _run_supervised(self, connect: Callable, label: str):
+        """Keep an SDK connection running, reconnecting with jittered exponential backoff"""
+        attempts = 0
+        while self._running:
+            started = time.monotonic()
+            try:
+                await connect()
+            except Exception as e:
+                logger.warning(f"{label} error: {e}")
+            if not self._running:
+                break
+            if time.monotonic() - started >= self.stable_uptime:
+                attempts = 0
+            await asyncio.sleep(min(self.reconnect_max_delay, 2 ** attempts + random.random()))
+            attempts += 1
+
 
+# FeishuChannel relies on lark-oapi private internals: the module-level
+# lark_oapi.ws.client.loop, ws.Client._auto_reconnect and ws.Client._disconnect.
+# Keep the SDK pinned to the 1.x line these were written against.
+LARK_OAPI_REQUIREMENT = "lark-oapi>=1.2,<2.0"
 
 try:
     import lark_oapi as lark
+    import lark_oapi.ws.client as lark_ws_client
     from lark_oapi.api.im.v1 import CreateMessageRequest, CreateMessageRequestBody
     FEISHU_AVAILABLE = True
 except ImportError:
@@ -82,19 +129,29 @@ except ImportError:
 
 
 class FeishuChannel(BaseIMChannel):
-    """Feishu channel using WebSocket via subprocess"""
+    """Feishu channel using the lark-oapi WebSocket client in-process"""
     
     name = "feishu"
+    # When sends are already backed up, wait send_batch_window and flush up to
+    # send_batch_size together; a lone send goes out immediately
+    send_batch_size = 32
+    send_batch_window = 0.02
+    # Card envelope with only the JSON-escaped markdown text spliced in
+    _CARD_TEMPLATE = '{"config":{"wide_screen_mode":true},"elements":[{"tag":"markdown","content":%s}]}'
     
     def __init__(self, config: dict, message_handler: Callable):
         super().__init__(config, message_handler)
         self._client: Any = None
-        self._process: Optional[subprocess.Popen] = None
-        self._poll_task: Optional[asyncio.Task] = None
+        self._ws_client: Any = None
+        self._ws_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ws_thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._send_queue: asyncio.Queue = asyncio.Queue()
+        self._send_task: Optional[asyncio.Task] = None
     
     async def start(self) -> bool:
         if not FEISHU_AVAILABLE:
-            logger.error("lark-oapi SDK not installed. Run: pip install lark-oapi")
+            logger.error(f'lark-oapi SDK not installed. Run: pip install "{LARK_OAPI_REQUIREMENT}"')
             return False
         
         app_id = self.config.get("app_id")
@@ -105,6 +162,7 @@ class FeishuChannel(BaseIMChannel):
             return False
         
         self._running = True
+        self._loop = asyncio.get_running_loop()
         
         logger.info(f"Initializing Feishu client with app_id: {app_id[:10]}...")
         
@@ -114,120 +172,181 @@ class FeishuChannel(BaseIMChannel):
             .log_level(lark.LogLevel.INFO) \
             .build()
         
-        script_path = os.path.join(os.path.dirname(__file__), "feishu_ws_subprocess.py")
+        event_handler = lark.EventDispatcherHandler.builder(
+            self.config.get("encrypt_key", ""),
+            self.config.get("verification_token", "")
+        ).register_p2_im_message_receive_v1(self._on_message_sync).build()
         
-        if not os.path.exists(script_path):
-            logger.error(f"Feishu subprocess script not found: {script_path}")
-            return False
-        
-        self._process = subprocess.Popen(
-            [
-                sys.executable, script_path,
-                app_id, app_secret,
-                self.config.get("encrypt_key", ""),
-                self.config.get("verification_token", "")
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
+        self._ws_client = lark.ws.Client(
+            app_id,
+            app_secret,
+            event_handler=event_handler,
+            log_level=lark.LogLevel.ERROR
         )
         
-        self._poll_task = asyncio.create_task(self._poll_messages())
+        # Created here so stop() always has a loop to shut down, even before the thread runs
+        self._ws_loop = asyncio.new_event_loop()
+        self._ws_thread = threading.Thread(target=self._run_ws, name="feishu-ws", daemon=True)
+        self._ws_thread.start()
+        self._send_task = asyncio.create_task(self._send_loop())
         
-        logger.info("Feishu WebSocket started via subprocess")
+        logger.info("Feishu WebSocket started")
         return True
     
-    async def _poll_messages(self):
-        """Poll messages from the WebSocket subprocess"""
-        import sys
-        
-        while self._running and self._process:
+    def _run_ws(self):
+        """Run the blocking lark WebSocket client on its own event loop"""
+        # lark_oapi.ws.client drives a module-level loop captured at import
+        # time, which may be the gateway's running loop; give it a private one
+        loop = self._ws_loop
+        asyncio.set_event_loop(loop)
+        if not hasattr(lark_ws_client, "loop"):
+            logger.warning("lark_oapi.ws.client has no module-level loop; check the lark-oapi version")
+        lark_ws_client.loop = loop
+        try:
+            self._ws_client.start()
+        except Exception as e:
+            if self._running:
+                logger.error(f"Feishu WebSocket stopped: {e}")
+        finally:
             try:
-                line = await asyncio.get_event_loop().run_in_executor(
-                    None, self._process.stdout.readline
-                )
-                
-                if not line:
-                    if self._process.poll() is not None:
-                        logger.warning("Feishu subprocess ended, restarting...")
-                        await self._restart_process()
-                    continue
-                
-                line = line.strip()
-                if not line:
-                    continue
-                
-                try:
-                    msg = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                
-                if msg.get("type") == "message":
-                    if self._is_processed(msg.get("message_id", "")):
-                        continue
-                    
-                    await self.message_handler(IMMessage(
-                        platform=IMPlatform.FEISHU,
-                        sender_id=msg.get("sender_id", ""),
-                        chat_id=msg.get("chat_id", ""),
-                        content=msg.get("content", ""),
-                        metadata={"message_id": msg.get("message_id", "")}
-                    ))
-                elif msg.get("type") == "status":
-                    logger.info(f"Feishu WebSocket: {msg.get('status')}")
-                elif msg.get("type") == "error":
-                    logger.warning(f"Feishu WebSocket error: {msg.get('error')}")
-                    
+                pending = asyncio.all_tasks(loop)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
             except Exception as e:
-                logger.error(f"Error polling Feishu messages: {e}")
-                await asyncio.sleep(1)
+                logger.debug(f"Feishu WebSocket cleanup failed: {e}")
+            finally:
+                loop.close()
     
-    async def _restart_process(self):
-        """Restart the Feishu subprocess"""
-        if self._process:
-            self._process.terminate()
-            self._process.wait()
-        
-        app_id = self.config.get("app_id")
-        app_secret = self.config.get("app_secret")
-        script_path = os.path.join(os.path.dirname(__file__), "feishu_ws_subprocess.py")
-        
-        self._process = subprocess.Popen(
-            [
-                sys.executable, script_path,
-                app_id, app_secret,
-                self.config.get("encrypt_key", ""),
-                self.config.get("verification_token", "")
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
+    async def _shutdown_ws(self):
+        """Runs on the WebSocket loop: disconnect the client, then stop the loop"""
+        client = self._ws_client
+        try:
+            # ws.Client has no public stop; disable reconnects and close the connection
+            if hasattr(client, "_auto_reconnect") and hasattr(client, "_disconnect"):
+                client._auto_reconnect = False
+                await client._disconnect()
+            else:
+                logger.warning("lark-oapi ws.Client has no _disconnect; stopping its loop directly")
+        except Exception as e:
+            logger.warning(f"Feishu WebSocket disconnect failed: {e}")
+        finally:
+            asyncio.get_running_loop().stop()
+    
+    def _on_message_sync(self, data):
+        """SDK callback on the WebSocket thread; hands the message to the gateway loop"""
+        try:
+            event = data.event
+            sender = event.sender
+            
+            if sender.sender_type == "bot" or not self._running:
+                return
+            
+            message = event.message
+            sid_obj = sender.sender_id
+            sender_id = sid_obj.open_id if sid_obj is not None else "unknown"
+            msg_type = message.message_type
+            
+            if msg_type == "text":
+                raw = message.content
+                try:
+                    content = _json_loads(raw).get("text", "")
+                except (ValueError, TypeError, AttributeError):
+                    content = raw or ""
+            else:
+                content = f"[{msg_type}]"
+            
+            if not content:
+                return
+            
+            chat_id = message.chat_id if message.chat_type == "group" else sender_id
+            asyncio.run_coroutine_threadsafe(
+                self._on_message(message.message_id, sender_id, chat_id, content),
+                self._loop
+            )
+        except Exception as e:
+            logger.error(f"Error handling Feishu event: {e}")
+    
+    async def _on_message(self, message_id: str, sender_id: str, chat_id: str, content: str):
+        try:
+            if self._is_processed(message_id):
+                return
+            
+            await self.message_handler(IMMessage(
+                platform=IMPlatform.FEISHU,
+                sender_id=sender_id,
+                chat_id=chat_id,
+                content=content,
+                metadata={"message_id": message_id}
+            ))
+        except Exception as e:
+            logger.error(f"Error handling Feishu message: {e}")
     
     async def stop(self):
         await super().stop()
-        if self._poll_task:
-            self._poll_task.cancel()
-        if self._process:
-            self._process.terminate()
-            self._process.wait(timeout=2)
+        if self._ws_loop and not self._ws_loop.is_closed():
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown_ws(), self._ws_loop)
+            except RuntimeError:
+                pass  # loop closed in the meantime
+        if self._ws_thread:
+            await asyncio.to_thread(self._ws_thread.join, 5)
+            if self._ws_thread.is_alive():
+                logger.warning("Feishu WebSocket thread did not exit in time")
+            self._ws_thread = None
+        if self._send_task:
+            self._send_task.cancel()
+            self._send_task = None
+        while not self._send_queue.empty():
+            _, _, fut = self._send_queue.get_nowait()
+            if not fut.done():
+                fut.set_result(False)
         logger.info("Feishu stopped")
     
     async def send_message(self, chat_id: str, text: str) -> bool:
-        if not self._client:
+        if not self._client or not self._send_task:
             logger.warning("Feishu client not initialized")
             return False
         
+        fut = asyncio.get_running_loop().create_future()
+        await self._send_queue.put((chat_id, text, fut))
+        return await fut
+    
+    async def _send_loop(self):
+        """Coalesce queued sends and run the blocking SDK calls in threads"""
+        queue = self._send_queue
+        while True:
+            batch = [await queue.get()]
+            try:
+                if not queue.empty():
+                    await asyncio.sleep(self.send_batch_window)
+                while len(batch) < self.send_batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+                
+                # Different chats are sent concurrently; one chat keeps its order
+                by_chat: Dict[str, list] = {}
+                for chat_id, text, fut in batch:
+                    by_chat.setdefault(chat_id, []).append((text, fut))
+                await asyncio.gather(*(
+                    self._send_chat(chat_id, items) for chat_id, items in by_chat.items()
+                ))
+            finally:
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_result(False)
+    
+    async def _send_chat(self, chat_id: str, items: list):
+        for text, fut in items:
+            ok = await asyncio.to_thread(self._blocking_send, chat_id, text)
+            if not fut.done():
+                fut.set_result(ok)
+    
+    def _blocking_send(self, chat_id: str, text: str) -> bool:
         try:
             receive_id_type = "chat_id" if chat_id.startswith("oc_") else "open_id"
             
-            card = {
-                "config": {"wide_screen_mode": True},
-                "elements": [{"tag": "markdown", "content": text}]
-            }
-            content = json.dumps(card, ensure_ascii=False)
+            content = self._CARD_TEMPLATE % _json_dumps(text)
             
             request = CreateMessageRequest.builder() \
                 .receive_id_type(receive_id_type) \
@@ -261,11 +380,17 @@ try:
 except ImportError:
     DINGTALK_AVAILABLE = False
 
+# Only probe for h2; httpx imports it itself when http2=True
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 
 class DingTalkChannel(BaseIMChannel):
     """DingTalk channel using Stream Mode"""
     
     name = "dingtalk"
+    queue_size = 256
+    worker_count = 8
+    _MSG_PARAM_TEMPLATE = '{"text":%s,"title":"SDFAI Reply"}'
     
     def __init__(self, config: dict, message_handler: Callable):
         super().__init__(config, message_handler)
@@ -273,7 +398,10 @@ class DingTalkChannel(BaseIMChannel):
         self._http: Any = None
         self._access_token: Optional[str] = None
         self._token_expiry: float = 0
-        self._background_tasks: set = set()
+        self._token_lock = asyncio.Lock()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers: list = []
+        self._stream_task: Optional[asyncio.Task] = None
     
     async def start(self) -> bool:
         if not DINGTALK_AVAILABLE:
@@ -288,7 +416,12 @@ class DingTalkChannel(BaseIMChannel):
             return False
         
         self._running = True
-        self._http = httpx.AsyncClient()
+        # One pooled client for token fetch and batchSend; HTTP/2 when h2 is installed
+        self._http = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(10.0, connect=3.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
         
         logger.info(f"Initializing DingTalk Stream Client...")
         
@@ -313,17 +446,18 @@ class DingTalkChannel(BaseIMChannel):
                     sender_id = chatbot_msg.sender_staff_id or chatbot_msg.sender_id
                     sender_name = chatbot_msg.sender_nick or "Unknown"
                     
-                    task = asyncio.create_task(
-                        channel.message_handler(IMMessage(
+                    try:
+                        channel._queue.put_nowait(IMMessage(
                             platform=IMPlatform.DINGTALK,
                             sender_id=sender_id,
                             chat_id=sender_id,
                             content=content,
                             sender_name=sender_name
                         ))
-                    )
-                    channel._background_tasks.add(task)
-                    task.add_done_callback(channel._background_tasks.discard)
+                    except asyncio.QueueFull:
+                        # Non-OK ack so the platform redelivers instead of losing the message
+                        logger.warning("DingTalk message queue full, asking for redelivery")
+                        return AckMessage.STATUS_SYSTEM_EXCEPTION, "busy"
                     
                     return AckMessage.STATUS_OK, "OK"
                 except Exception as e:
@@ -331,31 +465,54 @@ class DingTalkChannel(BaseIMChannel):
         
         self._client.register_callback_handler(ChatbotMessage.TOPIC, Handler())
         
-        asyncio.create_task(self._run_stream())
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.worker_count)
+        ]
+        self._stream_task = asyncio.create_task(
+            self._run_supervised(self._client.start, "DingTalk stream")
+        )
         logger.info("DingTalk bot started with Stream Mode")
         return True
     
-    async def _run_stream(self):
-        while self._running:
+    async def _worker(self):
+        while True:
+            msg = await self._queue.get()
             try:
-                await self._client.start()
+                await self.message_handler(msg)
             except Exception as e:
-                logger.warning(f"DingTalk stream error: {e}")
-            if self._running:
-                await asyncio.sleep(5)
+                logger.error(f"Error handling DingTalk message: {e}")
+            finally:
+                self._queue.task_done()
     
     async def stop(self):
         await super().stop()
         if self._http:
             await self._http.aclose()
-        for task in self._background_tasks:
+        if self._stream_task:
+            self._stream_task.cancel()
+            self._stream_task = None
+        for task in self._workers:
             task.cancel()
+        self._workers = []
+        dropped = self._queue.qsize()
+        if dropped:
+            logger.warning(f"DingTalk stopped with {dropped} unhandled messages dropped")
+            while not self._queue.empty():
+                self._queue.get_nowait()
+                self._queue.task_done()
         logger.info("DingTalk stopped")
     
     async def _get_access_token(self) -> Optional[str]:
         if self._access_token and time.time() < self._token_expiry:
             return self._access_token
         
+        # Only one coroutine refreshes; the others reuse its token
+        async with self._token_lock:
+            if self._access_token and time.time() < self._token_expiry:
+                return self._access_token
+            return await self._refresh_access_token()
+    
+    async def _refresh_access_token(self) -> Optional[str]:
         client_id = self.config.get("client_id") or self.config.get("app_key")
         client_secret = self.config.get("client_secret") or self.config.get("app_secret")
         
@@ -385,11 +542,15 @@ class DingTalkChannel(BaseIMChannel):
             "robotCode": client_id,
             "userIds": [chat_id],
             "msgKey": "sampleMarkdown",
-            "msgParam": json.dumps({"text": text, "title": "SDFAI Reply"})
+            "msgParam": self._MSG_PARAM_TEMPLATE % _json_dumps(text)
         }
         
         try:
-            resp = await self._http.post(url, json=data, headers=headers)
+            try:
+                resp = await self._http.post(url, json=data, headers=headers)
+            except httpx.RemoteProtocolError:
+                # A reset HTTP/2 stream or dropped keep-alive connection is safe to retry once
+                resp = await self._http.post(url, json=data, headers=headers)
             if resp.status_code != 200:
                 logger.error(f"DingTalk send failed: {resp.text}")
                 return False
@@ -446,27 +607,29 @@ class QQChannel(BaseIMChannel):
                 await channel._on_message(message)
         
         self._client = Bot(intents=intents)
-        self._bot_task = asyncio.create_task(self._run_bot())
+        # botpy captures a loop at construction; it must be the gateway's running loop
+        loop = asyncio.get_running_loop()
+        if getattr(self._client, "loop", loop) is not loop:
+            logger.warning("QQ client bound to a different event loop, rebinding")
+            self._client.loop = loop
+        self._bot_task = asyncio.create_task(
+            self._run_supervised(self._connect_bot, "QQ bot")
+        )
         
         logger.info("QQ bot started")
         return True
     
-    async def _run_bot(self):
-        while self._running:
-            try:
-                await self._client.start(
-                    appid=self.config.get("app_id"),
-                    secret=self.config.get("secret")
-                )
-            except Exception as e:
-                logger.warning(f"QQ bot error: {e}")
-            if self._running:
-                await asyncio.sleep(5)
+    async def _connect_bot(self):
+        await self._client.start(
+            appid=self.config.get("app_id"),
+            secret=self.config.get("secret")
+        )
     
     async def stop(self):
         await super().stop()
         if self._bot_task:
             self._bot_task.cancel()
+            self._bot_task = None
         logger.info("QQ stopped")
     
     async def send_message(self, chat_id: str, text: str) -> bool:
@@ -510,6 +673,12 @@ class QQChannel(BaseIMChannel):
 class UnifiedIMGateway:
     """Unified IM Gateway Manager"""
     
+    _REGISTRY = [
+        ("feishu", IMPlatform.FEISHU, FeishuChannel),
+        ("dingtalk", IMPlatform.DINGTALK, DingTalkChannel),
+        ("qq", IMPlatform.QQ, QQChannel),
+    ]
+    
     def __init__(self, config: dict):
         self.config = config
         self.channels: Dict[IMPlatform, BaseIMChannel] = {}
@@ -523,26 +692,25 @@ class UnifiedIMGateway:
         results = {}
         im_config = self.config.get("im", {})
         
-        if im_config.get("feishu", {}).get("enabled"):
-            channel = FeishuChannel(im_config["feishu"], self._handle_message)
-            success = await channel.start()
-            if success:
-                self.channels[IMPlatform.FEISHU] = channel
-            results["feishu"] = success
+        candidates = []
+        for name, platform, channel_cls in self._REGISTRY:
+            platform_config = im_config.get(name, {})
+            if platform_config.get("enabled"):
+                candidates.append((name, platform, channel_cls(platform_config, self._handle_message)))
         
-        if im_config.get("dingtalk", {}).get("enabled"):
-            channel = DingTalkChannel(im_config["dingtalk"], self._handle_message)
-            success = await channel.start()
-            if success:
-                self.channels[IMPlatform.DINGTALK] = channel
-            results["dingtalk"] = success
+        # Start all enabled platforms concurrently
+        starts = await asyncio.gather(
+            *(channel.start() for _, _, channel in candidates),
+            return_exceptions=True
+        )
         
-        if im_config.get("qq", {}).get("enabled"):
-            channel = QQChannel(im_config["qq"], self._handle_message)
-            success = await channel.start()
+        for (name, platform, channel), success in zip(candidates, starts):
+            if isinstance(success, BaseException):
+                logger.error(f"Failed to start {name}: {success}")
+                success = False
             if success:
-                self.channels[IMPlatform.QQ] = channel
-            results["qq"] = success
+                self.channels[platform] = channel
+            results[name] = success
         
         return results
     
@@ -564,7 +732,7 @@ class UnifiedIMGateway:
     @staticmethod
     def get_required_packages() -> Dict[str, str]:
         return {
-            "feishu": "pip install lark-oapi",
-            "dingtalk": "pip install dingtalk-stream",
+            "feishu": f'pip install "{LARK_OAPI_REQUIREMENT}"',
+            "dingtalk": "pip install dingtalk-stream httpx[http2]",
             "qq": "pip install qq-botpy"
         }
@@ -5,18 +5,18 @@ LLM故障转移管理器
 """
 import asyncio
 import logging
+import time
 from typing import Optional
-from datetime import datetime, timedelta
 from dataclasses import dataclass
 
 logger = logging.getLogger('llm_failover')
 
 
-@dataclass
+@dataclass(slots=True)
 class LLMStatus:
     name: str
     is_healthy: bool
-    last_success: datetime
+    last_success: float  # time.monotonic() 秒
     failure_count: int
     is_primary: bool
 
@@ -31,7 +31,7 @@ class LLMFailoverManager:
         self.primary_status = LLMStatus(
             name="Kimi-K2-5",
             is_healthy=True,
-            last_success=datetime.now(),
+            last_success=time.monotonic(),
             failure_count=0,
             is_primary=True
         )
@@ -39,65 +39,115 @@ class LLMFailoverManager:
         self.fallback_status = LLMStatus(
             name="Qwen3-1.7B",
             is_healthy=True,
-            last_success=datetime.now(),
+            last_success=time.monotonic(),
             failure_count=0,
             is_primary=False
         )
         
         self.max_failures = 3
-        self.recovery_interval = timedelta(minutes=5)
+        self.recovery_interval = 300.0  # 秒
+        
+        # 使用备用LLM期间主动探测主LLM，间隔按指数退避增长
+        self.probe_base_interval = 30.0
+        self.probe_max_interval = 300.0
+        self.probe_timeout = 5.0
+        self._probe_task: Optional[asyncio.Task] = None
+        self._switch_lock = asyncio.Lock()
     
     async def chat(self, message: str, **kwargs):
         """带故障转移的聊天"""
-        # 尝试当前LLM
+        # 快照当前LLM，调用期间其他协程的切换不影响本次的记录与重试
+        llm = self.current_llm
+        using_fallback = self.is_using_fallback
         try:
-            response = await self.current_llm.chat(message, **kwargs)
-            self._record_success()
+            response = await llm.chat(message, **kwargs)
+            self._record_success(is_fallback=using_fallback)
             return response
         except Exception as e:
-            logger.error(f"LLM错误 ({self._get_current_name()}): {e}")
-            self._record_failure()
+            logger.error(f"LLM错误 ({'Qwen' if using_fallback else 'Kimi'}): {e}")
+            self._record_failure(is_fallback=using_fallback)
             
-            # 如果主LLM失败，切换到备用
-            if not self.is_using_fallback and self.fallback_llm:
-                logger.warning("⚠️ 主LLM失败，切换到备用LLM (Qwen)")
-                self.is_using_fallback = True
-                self.current_llm = self.fallback_llm
-                
-                try:
-                    response = await self.current_llm.chat(message, **kwargs)
-                    self._record_success(is_fallback=True)
-                    return response
-                except Exception as e2:
-                    logger.error(f"备用LLM也失败: {e2}")
-                    raise e2
-            else:
+            if using_fallback or not self.fallback_llm:
                 raise e
+            
+            # 如果主LLM失败，切换到备用（只切换一次）
+            async with self._switch_lock:
+                if not self.is_using_fallback:
+                    logger.warning("⚠️ 主LLM失败，切换到备用LLM (Qwen)")
+                    self.is_using_fallback = True
+                    self.current_llm = self.fallback_llm
+                    self._start_probe()
+            
+            try:
+                response = await self.fallback_llm.chat(message, **kwargs)
+                self._record_success(is_fallback=True)
+                return response
+            except Exception as e2:
+                logger.error(f"备用LLM也失败: {e2}")
+                raise e2
     
     def _get_current_name(self) -> str:
         return "Qwen" if self.is_using_fallback else "Kimi"
     
     def _record_success(self, is_fallback: bool = False):
         status = self.fallback_status if is_fallback else self.primary_status
+        now = time.monotonic()
         status.is_healthy = True
-        status.last_success = datetime.now()
+        status.last_success = now
         status.failure_count = 0
         
         # 如果备用LLM成功，检查是否可以恢复主LLM
         if is_fallback and self.primary_status.failure_count >= self.max_failures:
-            if datetime.now() - self.primary_status.last_success > self.recovery_interval:
+            if now - self.primary_status.last_success > self.recovery_interval:
                 logger.info("🔄 尝试恢复主LLM...")
-                self.is_using_fallback = False
-                self.current_llm = self.primary_llm
+                self._restore_primary()
     
-    def _record_failure(self):
-        if self.is_using_fallback:
+    def _record_failure(self, is_fallback: bool = False):
+        if is_fallback:
             self.fallback_status.failure_count += 1
             self.fallback_status.is_healthy = False
         else:
             self.primary_status.failure_count += 1
             self.primary_status.is_healthy = False
     
+    def _restore_primary(self):
+        self.is_using_fallback = False
+        self.current_llm = self.primary_llm
+        self._stop_probe()
+    
+    def _start_probe(self):
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_primary())
+    
+    def _stop_probe(self):
+        task = self._probe_task
+        self._probe_task = None
+        if task and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+    
+    async def _probe_primary(self):
+        """后台探测主LLM，恢复后切回"""
+        attempt = 0
+        while self.is_using_fallback:
+            await asyncio.sleep(min(self.probe_max_interval, self.probe_base_interval * 2 ** attempt))
+            attempt += 1
+            try:
+                await asyncio.wait_for(self.primary_llm.chat("ping"), timeout=self.probe_timeout)
+            except Exception as e:
+                logger.debug(f"主LLM探测失败 (第{attempt}次): {e}")
+                continue
+            
+            logger.info("🔄 主LLM探测成功，切回主LLM")
+            self._record_success()
+            self._restore_primary()
+    
+    async def close(self):
+        """停止后台探测"""
+        task = self._probe_task
+        self._stop_probe()
+        if task:
+            await asyncio.gather(task, return_exceptions=True)
+    
     def get_status(self) -> dict:
         return {
             "current_llm": self._get_current_name(),
@@ -3,13 +3,14 @@
 SDFAI Storage Module - Abstract Storage Interface
 Provides unified storage abstraction for different backends.
 """
+import itertools
 from abc import ABC, abstractmethod
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from dataclasses import dataclass
 import time
 
 
-@dataclass
+@dataclass(slots=True)
 class StorageItem:
     key: str
     value: str
@@ -42,9 +43,13 @@ class BaseStore(ABC):
         pass
     
     @abstractmethod
-    def list(self, prefix: str = None, limit: int = 100) -> List[StorageItem]:
+    def iter_prefix(self, prefix: str = None, limit: int = None) -> Iterator[StorageItem]:
+        """Lazily yield items whose key starts with prefix (all items if None)."""
         pass
     
+    def list(self, prefix: str = None, limit: int = 100) -> List[StorageItem]:
+        return list(itertools.islice(self.iter_prefix(prefix, limit), limit))
+    
     @abstractmethod
     def exists(self, key: str) -> bool:
         pass
@@ -4,9 +4,11 @@ SDFAI File Storage Backend
 Provides Markdown-based storage for human-readable memory (OpenClaw style).
 """
 import os
+import io
+import atexit
 import threading
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from datetime import datetime
 from pathlib import Path
 
@@ -34,7 +36,18 @@ class MarkdownStore(BaseStore):
         self.base_dir.mkdir(parents=True, exist_ok=True)
         
         self.memory_file = self.base_dir / "MEMORY.md"
-        self._lock = threading.Lock()
+        # Reentrant: set/delete hold it while reading through the cache
+        self._lock = threading.RLock()
+        
+        # Parsed MEMORY.md, valid while the file's (st_mtime_ns, st_size) is unchanged
+        self._cache: Optional[Dict] = None
+        self._cache_stat: Optional[tuple] = None
+        # key -> (section, value) for the cached parse; first section wins, as in a scan
+        self._index: Dict[str, Tuple[str, str]] = {}
+        # Last "## " section in the file and whether it ends with a newline;
+        # new keys for that section can be appended without a rewrite
+        self._tail_section: Optional[str] = None
+        self._tail_newline = False
         
         self._init_memory_file()
     
@@ -48,17 +61,82 @@ class MarkdownStore(BaseStore):
     
     def _read_memory_file(self) -> Dict:
         try:
-            if not self.memory_file.exists():
+            try:
+                st = os.stat(self.memory_file)
+            except FileNotFoundError:
+                self._reset_cache()
                 return {"title": "SDFAI Core Memory", "sections": {}}
             
-            with open(self.memory_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            return self._parse_markdown(content)
+            stat_key = (st.st_mtime_ns, st.st_size)
+            with self._lock:
+                if self._cache is not None and self._cache_stat == stat_key:
+                    return self._cache
+                
+                with open(self.memory_file, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                
+                return self._load(content, stat_key)
         except Exception as e:
             logger.error(f"Failed to read memory file: {e}")
+            self._reset_cache()
             return {"title": "SDFAI Core Memory", "sections": {}}
     
+    def _reset_cache(self):
+        # Without a readable file there is no section to append to; force a full rewrite
+        with self._lock:
+            self._cache = None
+            self._cache_stat = None
+            self._index = {}
+            self._tail_section = None
+            self._tail_newline = False
+    
+    def _load(self, content: str, stat_key: tuple) -> Dict:
+        data = self._parse_markdown(content)
+        index = {}
+        for section, entries in data["sections"].items():
+            for key, value in entries.items():
+                index.setdefault(key, (section, value))
+        
+        start = content.rfind('\n## ') + 1
+        if start == 0 and not content.startswith('## '):
+            self._tail_section = None
+        else:
+            end = content.find('\n', start)
+            self._tail_section = content[start + 3:end if end != -1 else None].strip()
+        self._tail_newline = content.endswith('\n')
+        
+        self._cache = data
+        self._index = index
+        self._cache_stat = stat_key
+        return data
+    
+    @staticmethod
+    def _copy_for_update(data: Dict, section: str) -> Dict:
+        """Copy the sections map and one section so the cached dict is never mutated"""
+        sections = dict(data.get("sections", {}))
+        sections[section] = dict(sections.get(section, {}))
+        return {**data, "sections": sections}
+    
+    def _append_entry(self, data: Dict, section: str, key: str, value: str):
+        """Append a new key to the file's last section instead of rewriting it"""
+        block = f"\n### {key}\n\n{value}\n"
+        if not self._tail_newline:
+            block = "\n" + block
+        
+        with self._lock:
+            self._cache = None
+            with open(self.memory_file, 'a', encoding='utf-8') as f:
+                f.write(block)
+            st = os.stat(self.memory_file)
+            
+            # Same value a re-parse would produce
+            stored = value.strip()
+            data["sections"][section][key] = stored
+            self._index[key] = (section, stored)
+            self._tail_newline = True
+            self._cache = data
+            self._cache_stat = (st.st_mtime_ns, st.st_size)
+    
     def _parse_markdown(self, content: str) -> Dict:
         result = {
             "title": "SDFAI Core Memory",
@@ -118,34 +196,43 @@ class MarkdownStore(BaseStore):
                 lines.append(str(value))
                 lines.append("")
         
-        with open(self.memory_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(lines))
+        content = '\n'.join(lines)
+        with self._lock:
+            # Drop the cache first so a failed write cannot leave it ahead of the file
+            self._cache = None
+            with open(self.memory_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+            st = os.stat(self.memory_file)
+            # Cache what a fresh read would return, not the caller's dict
+            self._load(content, (st.st_mtime_ns, st.st_size))
     
     def get(self, key: str) -> Optional[StorageItem]:
-        data = self._read_memory_file()
+        with self._lock:
+            self._read_memory_file()
+            entry = self._index.get(key)
         
-        for section, entries in data.get("sections", {}).items():
-            if key in entries:
-                return StorageItem(
-                    key=key,
-                    value=entries[key],
-                    metadata={"section": section}
-                )
+        if entry is None:
+            return None
         
-        return None
+        section, value = entry
+        return StorageItem(
+            key=key,
+            value=value,
+            metadata={"section": section}
+        )
     
     def set(self, key: str, value: str, metadata: Dict = None) -> bool:
         with self._lock:
             try:
-                data = self._read_memory_file()
-                
                 section = metadata.get("section", "general") if metadata else "general"
+                # Readers may still be iterating the cached dict; update a copy
+                data = self._copy_for_update(self._read_memory_file(), section)
                 
-                if "sections" not in data:
-                    data["sections"] = {}
-                
-                if section not in data["sections"]:
-                    data["sections"][section] = {}
+                text = str(value)
+                if (key not in self._index and section == self._tail_section
+                        and '\n## ' not in '\n' + text and '\n### ' not in '\n' + text):
+                    self._append_entry(data, section, key, text)
+                    return True
                 
                 data["sections"][section][key] = value
                 
@@ -159,35 +246,29 @@ class MarkdownStore(BaseStore):
         with self._lock:
             try:
                 data = self._read_memory_file()
+                entry = self._index.get(key)
+                if entry is None:
+                    return False
                 
-                for section in data.get("sections", {}):
-                    if key in data["sections"][section]:
-                        del data["sections"][section][key]
-                        self._write_memory_file(data)
-                        return True
-                
-                return False
+                data = self._copy_for_update(data, entry[0])
+                del data["sections"][entry[0]][key]
+                self._write_memory_file(data)
+                return True
             except Exception as e:
                 logger.error(f"Failed to delete memory: {e}")
                 return False
     
-    def list(self, prefix: str = None, limit: int = 100) -> List[StorageItem]:
+    def iter_prefix(self, prefix: str = None, limit: int = None) -> Iterator[StorageItem]:
         data = self._read_memory_file()
-        items = []
         
         for section, entries in data.get("sections", {}).items():
             for key, value in entries.items():
                 if prefix is None or key.startswith(prefix):
-                    items.append(StorageItem(
+                    yield StorageItem(
                         key=key,
                         value=value,
                         metadata={"section": section}
-                    ))
-                    
-                    if len(items) >= limit:
-                        return items
-        
-        return items
+                    )
     
     def exists(self, key: str) -> bool:
         return self.get(key) is not None
@@ -209,8 +290,16 @@ class DailyLogStore:
     """
     Daily log storage in Markdown format.
     Creates one file per day for conversation logs.
+    
+    Appends go through a long-lived buffered handle per file and are
+    flushed (with one fsync per batch) once flush_threshold bytes are
+    pending or flush_interval seconds after the first unflushed entry.
     """
     
+    flush_threshold = 64 * 1024
+    flush_interval = 0.5
+    max_open_handles = 2
+    
     def __init__(self, base_dir: str = None):
         if base_dir is None:
             base_dir = os.path.expanduser("~/.sdfai/memory")
@@ -218,6 +307,59 @@ class DailyLogStore:
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
         self._lock = threading.Lock()
+        
+        self._handles: Dict[Path, io.BufferedWriter] = {}
+        self._pending_bytes = 0
+        self._timer: Optional[threading.Timer] = None
+        atexit.register(self.close)
+    
+    def _get_handle(self, log_file: Path) -> io.BufferedWriter:
+        handle = self._handles.get(log_file)
+        if handle is None:
+            # Yesterday's handle is closed once a new day's file is opened
+            while len(self._handles) >= self.max_open_handles:
+                old = self._handles.pop(next(iter(self._handles)))
+                self._flush_handle(old)
+                old.close()
+            handle = open(log_file, 'ab', buffering=self.flush_threshold)
+            self._handles[log_file] = handle
+        return handle
+    
+    @staticmethod
+    def _flush_handle(handle: io.BufferedWriter):
+        handle.flush()
+        os.fsync(handle.fileno())
+    
+    def _flush_locked(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending_bytes:
+            return
+        for handle in self._handles.values():
+            self._flush_handle(handle)
+        self._pending_bytes = 0
+    
+    def flush(self):
+        """Write out and fsync all buffered log entries."""
+        with self._lock:
+            try:
+                self._flush_locked()
+            except Exception as e:
+                logger.error(f"Failed to flush logs: {e}")
+    
+    def close(self):
+        """Flush and close all open log files."""
+        # Drop the exit hook so a closed store can be garbage collected
+        atexit.unregister(self.close)
+        with self._lock:
+            try:
+                self._flush_locked()
+            except Exception as e:
+                logger.error(f"Failed to flush logs: {e}")
+            for handle in self._handles.values():
+                handle.close()
+            self._handles.clear()
     
     def _get_daily_file(self, date: datetime = None) -> Path:
         if date is None:
@@ -233,23 +375,20 @@ class DailyLogStore:
                 
                 timestamp = datetime.now().strftime('%H:%M:%S')
                 
-                entry_lines = [
-                    f"### [{timestamp}]",
-                    ""
-                ]
-                
+                # The whole entry is encoded once and handed over in a single write
+                meta = ""
                 if metadata:
-                    for key, value in metadata.items():
-                        entry_lines.append(f"- {key}: {value}")
-                    entry_lines.append("")
+                    meta = ''.join(f"- {key}: {value}\n" for key, value in metadata.items()) + "\n"
+                data = f"### [{timestamp}]\n\n{meta}{content}\n\n---\n".encode('utf-8')
+                self._get_handle(log_file).write(data)
+                self._pending_bytes += len(data)
                 
-                entry_lines.append(content)
-                entry_lines.append("")
-                entry_lines.append("---")
-                entry_lines.append("")
-                
-                with open(log_file, 'a', encoding='utf-8') as f:
-                    f.write('\n'.join(entry_lines))
+                if self._pending_bytes >= self.flush_threshold:
+                    self._flush_locked()
+                elif self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
                 
                 return True
             except Exception as e:
@@ -260,6 +399,11 @@ class DailyLogStore:
         try:
             log_file = self._get_daily_file(date)
             
+            with self._lock:
+                handle = self._handles.get(log_file)
+                if handle:
+                    handle.flush()
+            
             if log_file.exists():
                 with open(log_file, 'r', encoding='utf-8') as f:
                     return f.read()
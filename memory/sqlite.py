@@ -9,7 +9,7 @@ import json
 import time
 import threading
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from pathlib import Path
 
 from .base import BaseStore, StorageItem
@@ -62,6 +62,16 @@ class SQLiteStore(BaseStore):
             
             conn.commit()
     
+    @staticmethod
+    def _row_to_item(row: sqlite3.Row) -> StorageItem:
+        return StorageItem(
+            key=row['key'],
+            value=row['value'],
+            metadata=json.loads(row['metadata']),
+            created_at=row['created_at'],
+            updated_at=row['updated_at']
+        )
+    
     def get(self, key: str) -> Optional[StorageItem]:
         try:
             with sqlite3.connect(self.db_path) as conn:
@@ -73,13 +83,7 @@ class SQLiteStore(BaseStore):
                 row = cursor.fetchone()
                 
                 if row:
-                    return StorageItem(
-                        key=row['key'],
-                        value=row['value'],
-                        metadata=json.loads(row['metadata']),
-                        created_at=row['created_at'],
-                        updated_at=row['updated_at']
-                    )
+                    return self._row_to_item(row)
                 return None
         except Exception as e:
             logger.error(f"SQLite get failed: {e}")
@@ -118,36 +122,32 @@ class SQLiteStore(BaseStore):
                 logger.error(f"SQLite delete failed: {e}")
                 return False
     
-    def list(self, prefix: str = None, limit: int = 100) -> List[StorageItem]:
+    def iter_prefix(self, prefix: str = None, limit: int = None) -> Iterator[StorageItem]:
+        # Rows are streamed from the cursor; the connection closes when the generator does
+        sql_limit = -1 if limit is None else limit
+        conn = None
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                
-                if prefix:
-                    cursor = conn.execute(
-                        f"SELECT * FROM {self.table} WHERE key LIKE ? ORDER BY created_at DESC LIMIT ?",
-                        (f"{prefix}%", limit)
-                    )
-                else:
-                    cursor = conn.execute(
-                        f"SELECT * FROM {self.table} ORDER BY created_at DESC LIMIT ?",
-                        (limit,)
-                    )
-                
-                items = []
-                for row in cursor.fetchall():
-                    items.append(StorageItem(
-                        key=row['key'],
-                        value=row['value'],
-                        metadata=json.loads(row['metadata']),
-                        created_at=row['created_at'],
-                        updated_at=row['updated_at']
-                    ))
-                
-                return items
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            
+            if prefix:
+                cursor = conn.execute(
+                    f"SELECT * FROM {self.table} WHERE key LIKE ? ORDER BY created_at DESC LIMIT ?",
+                    (f"{prefix}%", sql_limit)
+                )
+            else:
+                cursor = conn.execute(
+                    f"SELECT * FROM {self.table} ORDER BY created_at DESC LIMIT ?",
+                    (sql_limit,)
+                )
+            
+            for row in cursor:
+                yield self._row_to_item(row)
         except Exception as e:
             logger.error(f"SQLite list failed: {e}")
-            return []
+        finally:
+            if conn is not None:
+                conn.close()
     
     def exists(self, key: str) -> bool:
         try:
@@ -184,17 +184,7 @@ class SQLiteStore(BaseStore):
                     LIMIT ?
                 """, (query, limit))
                 
-                items = []
-                for row in cursor.fetchall():
-                    items.append(StorageItem(
-                        key=row['key'],
-                        value=row['value'],
-                        metadata=json.loads(row['metadata']),
-                        created_at=row['created_at'],
-                        updated_at=row['updated_at']
-                    ))
-                
-                return items
+                return [self._row_to_item(row) for row in cursor]
         except Exception as e:
             logger.error(f"SQLite search failed: {e}")
             return []
@@ -26,6 +26,10 @@ BASE_DIR = Path(__file__).parent
 CONFIG_FILE = BASE_DIR / "sdfai_config.json"
 DATA_DIR = BASE_DIR / "data"
 
+# Event loop implementation: uvloop | uringcore | default.
+# Unset means uvloop when installed, otherwise the stdlib loop.
+EVENT_LOOP = os.environ.get("SDFAI_EVENT_LOOP", "").lower()
+
 
 def load_config():
     if CONFIG_FILE.exists():
@@ -33,6 +37,42 @@ def load_config():
     return {}
 
 
+def install_event_loop() -> str:
+    """Install the event loop policy selected by SDFAI_EVENT_LOOP"""
+    if EVENT_LOOP == "uringcore":
+        try:
+            import uringcore
+            asyncio.set_event_loop_policy(uringcore.EventLoopPolicy())
+            return "uringcore"
+        except ImportError:
+            logger.warning("uringcore not installed, falling back to default event loop")
+            _install_child_watcher()
+            return "default"
+    
+    if EVENT_LOOP in ("", "uvloop"):
+        try:
+            import uvloop
+            uvloop.install()
+            return "uvloop"
+        except ImportError:
+            if EVENT_LOOP:
+                logger.warning("uvloop not installed, falling back to default event loop")
+    
+    _install_child_watcher()
+    return "default"
+
+
+def _install_child_watcher():
+    """Reap subprocesses through pidfd on the stdlib loop (3.12+ does this by default)"""
+    if sys.version_info >= (3, 12) or not hasattr(os, "pidfd_open"):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return
+    asyncio.set_child_watcher(asyncio.PidfdChildWatcher())
+
+
 class SDFAI:
     def __init__(self, config: dict):
         self.config = config
@@ -40,6 +80,7 @@ class SDFAI:
         self.sdf_client = None
         self.llm_gateway = None
         self.supervisor_gateway = None  # 监督LLM
+        self.llm_failover = None
         self._running = False
         
         # Core模块
@@ -364,6 +405,9 @@ class SDFAI:
         if self.im_gateway:
             await self.im_gateway.stop_all()
         
+        if self.llm_failover:
+            await self.llm_failover.close()
+        
         if self.sdf_client:
             await self.sdf_client.disconnect()
         
@@ -382,4 +426,5 @@ async def main():
 
 
 if __name__ == "__main__":
+    logger.info(f"Event loop: {install_event_loop()}")
     asyncio.run(main())